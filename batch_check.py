@@ -0,0 +1,42 @@
+import argparse
+import os
+
+import harness
+
+parser = argparse.ArgumentParser(description='Grade a directory of submissions laid out as <submission>/<assignment>/<file>')
+
+parser.add_argument('submissions', type=str, help='Directory with one folder per submission')
+parser.add_argument('--output', type=str, help='Path of the merged JSON result file', default='results.json')
+parser.add_argument('--assignments', type=str, help=f'(optional) comma-separated assignment folders to grade, out of {",".join(harness.ASSIGNMENTS)}', default=None)
+parser.add_argument('--case', type=str, help='(optional) Test case name', default=None)
+parser.add_argument('--tags', type=str, help='(optional) List of tags', default=None)
+parser.add_argument('--workers', type=int, help='(optional) number of test cases executed at the same time', default=os.cpu_count())
+parser.add_argument('--timingreport', type=str, help='(optional) write the duration of every test step to this JSON or CSV file', default=None)
+parser.add_argument('--timeoutscale', type=float, help='(optional) multiply every expectation timeout by this factor', default=harness.timeout_scale())
+parser.add_argument('--ephemeralports', action='store_true', help='(optional) give every HTTP and DNS test case its own free port')
+parser.add_argument('--isolate', action='store_true', help='(optional) execute every test case in its own network namespace. dns_check cases still use the network of the machine, because the DNS server has to reach the upstream servers')
+
+def main():
+    args = parser.parse_args()
+
+    assignments = [assignment.strip() for assignment in args.assignments.split(',') if assignment.strip()] if args.assignments else harness.ASSIGNMENTS
+    unknown = [assignment for assignment in assignments if assignment not in harness.ASSIGNMENTS]
+
+    if unknown or not assignments:
+        parser.error(f'unknown assignment {", ".join(unknown) or "list"}, expected a comma-separated list out of {",".join(harness.ASSIGNMENTS)}')
+
+    harness.set_timeout_scale(args.timeoutscale)
+    harness.enable_network_isolation(args.isolate)
+    harness.enable_ephemeral_ports(args.ephemeralports)
+
+    results = harness.grade_submissions(args.submissions, assignments, args.case, harness.parse_tags(args.tags), args.workers, args.timingreport)
+    harness.write_results(results, args.output)
+
+    for submission, assignment_results in results.items():
+        summary = ', '.join(f'{assignment} {result["passed"]}/{result["passed"] + result["failed"]}' for assignment, result in assignment_results.items() if not result['missing'])
+        print(f'{submission}: {summary or "no assignments found"}')
+
+    print(f'Graded {len(results)} submissions. The results are written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -1,109 +1,51 @@
 import pexpect
 import os
-import argparse
-import json
-import random
-import string
-from pexpect.exceptions import TIMEOUT as TimeoutException, EOF as EndOfFileException
+import sys
+import time
+from pexpect.exceptions import TIMEOUT as TimeoutException
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import harness
+from harness import TestException, execute_and_detach, expect_messages_in_order, generate_message, generate_name, handle_pexpect
 
 SERVER_ADDRESS = '127.0.0.1'
-SERVER_PORT = 5378
+JAVA_SERVER_PORT = 5378  # ChatServer.jar always listens on this port
+SERVER_PORT = JAVA_SERVER_PORT
 
 STUDENT_FILE_PATH = "../student/chat_client_check/client.py"
 
-class TestException(Exception):
-    pass
+LOGIN_FAILURE_PATTERNS = harness.DEFAULT_FAILURE_PATTERNS + ['Cannot log in']
 
-def generate_name():
-    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(8, 16)))
+USE_JAVA_SERVER = False
+REFERENCE_SERVER = None
 
-def generate_message(min_len=32, max_len=64):
-    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(min_len, max_len)))
+FLOOD_SETTINGS = {'deliveries': 5000, 'rate': 2000}
 
-def get_last_printed_line(output_buffer):
-    last_printed_line = '[EMPTY LINE. PROGRAM DID NOT PRODUCE ANY OUTPUT]'
-    lines = output_buffer.split('\n')
+def start_server(maxClients=300, clientListPrintingOn=True, delayOn=True):
+    global SERVER_PORT, REFERENCE_SERVER
 
-    for line in reversed(lines):
-        if line.strip():
-            last_printed_line = line
-            break
+    if not USE_JAVA_SERVER:
+        server = harness.ReferenceChatServer(SERVER_ADDRESS, 0, maxClients, clientListPrintingOn, delayOn).start()
+        SERVER_PORT = server.port
+        REFERENCE_SERVER = server
 
-    return last_printed_line
+        return [server]
 
-def handle_pexpect(child_process, processes_to_terminate, expect_string, output_buffer, step, timeout=1, display_expect_string=''):
-    try:
-        child_process.expect(expect_string, timeout=timeout)
-        output_buffer += child_process.before + child_process.after
+    SERVER_PORT = JAVA_SERVER_PORT
+    server_process = execute_and_detach(f'java -jar ChatServer.jar {maxClients} {clientListPrintingOn} {delayOn}')
+    server_process.expect(f'Now listening on port {SERVER_PORT}')
+    echobot_process = execute_and_detach(f'java -jar EchoBot.jar {SERVER_ADDRESS} {SERVER_PORT}')
+    delaybot_process = execute_and_detach(f'java -jar EchoBot.jar {SERVER_ADDRESS} {SERVER_PORT} delaybot')
 
-    except TimeoutException:
-        output_buffer += child_process.before
-        last_printed_line = get_last_printed_line(output_buffer)
-
-        for process in processes_to_terminate:
-            process.terminate(force=True)
-
-        if display_expect_string:
-            expect_string = display_expect_string
-
-        raise TestException(f'unexpected output at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    except EndOfFileException:
-        if type(child_process.before) == 'str':
-            output_buffer += child_process.before
-        
-        if type(child_process.after) == 'str':
-            output_buffer += child_process.after
-        
-        last_printed_line = get_last_printed_line(output_buffer)
-
-        for process in processes_to_terminate:
-            process.terminate(force=True)
-            
-        raise TestException(f'program has unexpectidly terminated at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    
-    return output_buffer
-    
+    # both bots are either added to the client list or turned away when the server is full
+    harness.wait_for_output(server_process, r'Adding client (echobot|delaybot)|Too many clients', count=2, timeout=5)
 
-def start_server(maxClients=300, clientListPrintingOn=True, delayOn=True):
-    server_process = execute_and_detach(f'java -jar ChatServer.jar {maxClients} {clientListPrintingOn} {delayOn}')
-    server_process.expect("Now listening on port 5378")
-    echobot_process = execute_and_detach("java -jar EchoBot.jar 127.0.0.1 5378")
-    delaybot_process = execute_and_detach("java -jar EchoBot.jar 127.0.0.1 5378 delaybot")
-
-    return server_process, echobot_process, delaybot_process
-
-
-def execute_and_wait(cmd):
-    process = pexpect.spawn('/bin/sh', ['-c', cmd], encoding='utf-8')
-    process.expect(pexpect.EOF)
-    output = process.before  # Capture the output
-    process.wait()
-
-    return process.exitstatus, output
-
-def execute_and_collect_output(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    while True:
-        try:
-            line = child.readline()
-            if not line:
-                break
-            yield line
-        except pexpect.EOF:
-            break
-
-def execute_and_detach(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    try:
-        child.expect(pexpect.EOF, timeout=0.5)
-        raise TestException(f'The command \'{cmd}\' has terminated unexpectedly')
-    except:
-        pass
-    return child
+    return [server_process, echobot_process, delaybot_process]
 
 def start_script():
     expected_output = 'Welcome to Chat Client. Enter your login:'
-    client_process = pexpect.spawn(f'python3 {STUDENT_FILE_PATH} --address "{SERVER_ADDRESS}" --port {SERVER_PORT}', encoding='utf-8')
+    client_process = harness.watch_process(pexpect.spawn(f'python3 {STUDENT_FILE_PATH} --address "{SERVER_ADDRESS}" --port {SERVER_PORT}', encoding='utf-8'))
 
     output_buffer = handle_pexpect(client_process, [client_process], expected_output, "", "starting client script")
 
@@ -116,7 +58,7 @@ def log_in(client_name=generate_name()):
     client_process.sendline(client_name)
     
     output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, 
-                   f'logging a client in with a name {client_name}')
+                   f'logging a client in with a name {client_name}', failure_patterns=LOGIN_FAILURE_PATTERNS)
 
     return client_process, output_buffer
 
@@ -187,14 +129,11 @@ def test_simple_exchange():
     client_process_2, output_buffer_2 = log_in(client_name_2)
 
     msgs = [generate_message() for _ in range(TOTAL_MSGS_SENT)]
-    expected_output = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in msgs])
-    expected_output_to_show = ''.join([f'From {client_name_1}: {msg}\n' for msg in msgs])
-
-    expected_output = r'\s*' + expected_output + r'\s*'
 
+    started = time.monotonic()
     [client_process_1.sendline(f'@{client_name_2} {msg}') for msg in msgs]
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2], expected_output, output_buffer_1, "simple message exchange (exchanging 10 messages between 2 clients)", 20, display_expect_string=expected_output_to_show)
+    output_buffer_2 = expect_messages_in_order(client_process_2, [client_process_1, client_process_2], client_name_1, msgs, output_buffer_1, "simple message exchange (exchanging 10 messages between 2 clients)", 20, peers=[client_process_1], started=started)
 
     return client_process_2, output_buffer_2
 
@@ -208,15 +147,12 @@ def test_longer_exchange_messages():
     client_process_2, output_buffer_2 = log_in(client_name_2)
 
     msgs = [generate_message(256, 512) for _ in range(TOTAL_MSGS_SENT)]
-    expected_output = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in msgs])
-    expected_output_to_show = ''.join([f'From {client_name_1}: {msg}\n' for msg in msgs])
-
-    expected_output = r'\s*' + expected_output + r'\s*'
 
+    started = time.monotonic()
     for msg in msgs:
         client_process_1.sendline(f'@{client_name_2} {msg}')
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2], expected_output, output_buffer_1, "simple message exchange with long messages (exchanging 10 messages between 2 clients)", 20, display_expect_string=expected_output_to_show)
+    output_buffer_2 = expect_messages_in_order(client_process_2, [client_process_1, client_process_2], client_name_1, msgs, output_buffer_1, "simple message exchange with long messages (exchanging 10 messages between 2 clients)", 20, peers=[client_process_1], started=started)
 
     return client_process_2, output_buffer_2
 
@@ -235,7 +171,6 @@ def send_message_to_unknown():
 
     return client_process, output_buffer
 
-
 def exchange_message_echobot():
     client_name_1 = generate_name()
     ECHOBOT_NAME = "echobot"
@@ -286,21 +221,8 @@ def check_name():
     return client_process, output_buffer
 
 def verify_file_for_sendall():
-    file_path = os.path.join(os.getcwd(), STUDENT_FILE_PATH)
+    harness.check_student_file(os.path.join(os.getcwd(), STUDENT_FILE_PATH), forbidden=[harness.SENDALL])
 
-    try:
-        with open(file_path, 'r') as file:
-            code_str = file.read()
-        
-        if "sendall" in code_str:
-            raise AssertionError("Found 'sendall' in the code.")
-        else:
-            return True
-    except FileNotFoundError:
-        raise TestException("File client.py. Please ensure that your implementation is located in the same folder under client.py name")
-    except Exception as e:
-        raise RuntimeError("An error occurred:", e)
-    
 def error_body():
     client_name_1 = generate_name()
     client_name_2 = "echobot"
@@ -381,115 +303,92 @@ def check_message_delay():
 
     message = generate_message()
 
-    expected_output = ''.join([rf'\s*From\s+delaybot:\s+{message}\s*\n' for _ in range(2)])
-    expected_output_to_show = ''.join([f'From delaybot: {message}\n' for _ in range(2)])
-
-    expected_output = r'\s*' + expected_output + r'\s*'
-
     client_process.sendline(f'@delaybot {message}')
 
-    output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, "delayed message exchange with delaybot. Delaybot duplicated received message and then sends back first half the message, then the rest one and a half", 7, display_expect_string=expected_output_to_show)
+    output_buffer = expect_messages_in_order(client_process, [client_process], 'delaybot', [message, message], output_buffer, "delayed message exchange with delaybot. Delaybot duplicated received message and then sends back first half the message, then the rest one and a half", 7)
 
     return client_process, output_buffer
 
-class TestCase():
-    def __init__(self, test_func, test_id, test_msg, tags=[], max_clients=300, clientListPrintingOn=True, delayOn=True) -> None:
-        self.tags = tags
-        self.test_func = test_func
-        self.test_id = test_id
-        self.test_msg = test_msg
+def delivery_flood():
+    if REFERENCE_SERVER is None:
+        raise TestException('the delivery flood is sent by the built-in reference server, please run it without --javaserver')
+
+    client_name = generate_name()
+    client_process, _ = log_in(client_name)
+
+    metrics, problems = harness.measure_delivery_flood(client_process, REFERENCE_SERVER, client_name, **FLOOD_SETTINGS)
+    harness.add_metrics(**metrics)
+    client_process.terminate(force=True)
+
+    if problems:
+        raise TestException(f'your client failed the delivery flood: {problems[0]}')
+
+    return client_process
+
+class TestCase(harness.TestCase):
+    def __init__(self, test_func, test_id, test_msg, tags=[], max_clients=300, clientListPrintingOn=True, delayOn=True, requires=[]) -> None:
+        super().__init__(test_func, test_id, test_msg, tags, requires)
         self.max_clients = max_clients
         self.clientListPrintingOn = clientListPrintingOn
         self.delayOn = delayOn
-    
-    def execute(self, disable_colors):
-        success = True
-        server_process, echobot, delaybot = start_server(self.max_clients, self.clientListPrintingOn, self.delayOn)
-        tags_string = ' '.join(self.tags)
-        
-        try:
-            self.test_func()
-
-            if not disable_colors:
-                print(f'\033[92m[ \u2713 ] \033[30m{self.test_id}. {self.test_msg}. \033[92mSuccess! \033[0m')
-            else:
-                print(f'[ \u2713 ] {self.test_id}. {self.test_msg}. Success!')
-
-        except Exception as e:
-            if not disable_colors:
-                print(f'\033[91m[ x ] \033[30m{self.test_id}. {self.test_msg} \033[91mFailed! \033[30m The list of tags is {tags_string} \nError message is {e} \033[0m')
-            else:
-                print(f'[ x ] {self.test_id}. {self.test_msg} Failed! The list of tags is {tags_string} \nError message is {e}')
-
-            success = False
-                
-        server_process.terminate(force=True)
-        echobot.terminate(force = True)
-        delaybot.terminate(force = True)
-
-        return success
 
+    @property
+    def exclusive(self):
+        # the in-process reference server listens on a free port of its own
+        return USE_JAVA_SERVER
+
+    def start_environment(self):
+        return start_server(self.max_clients, self.clientListPrintingOn, self.delayOn)
 
 test_cases = [
     TestCase(start_script, "chat_001", "Start application and expect welcome message", ['RA1', 'RI2', 'RT7']),
-    TestCase(log_in, "chat_002", "Log in with unique name and expect success message", ['RI1', 'RT7', 'RI3']),
-    TestCase(check_name, "chat_003", "A client must inform the user if their username was rejected for any other reason and ask for a new username - forbidden symbols (!@#$%^&*)", ['RI1', 'RT7', 'RA4', 'RT1']),
-    TestCase(log_in_duplicate, "chat_004", "Log in with duplicate name and expect in use messsage", ['RI1', 'RT7', 'RA2', 'RI4']),
-    TestCase(not_restart_failed_attempt, "chat_005", "Expect client to not restart after a failed log in attempt", ['RI1', 'RT7', 'RA6']),
-    TestCase(test_busy, "chat_006", "Log in with busy server, expect failure, and shut client down gracefully", ['RI1', 'RT7', 'RI6'], max_clients=0),
-    TestCase(list_users, "chat_007", "List users and expect success", ['RI1', 'RT7', 'RC2', 'RI11']),
-    TestCase(test_simple_exchange, "chat_008", "Send message to other user and expect success", ['RI1', 'RT7', 'RI2', 'RI8', 'RI10']),
-    TestCase(test_longer_exchange_messages, "chat_009", "Send long message to other user and expect success", ['RI1', 'RT7', 'RI2', 'RI8', 'RI10']),
-    TestCase(exchange_message_echobot,"chat_010", "A client should be able to send a message to echobot and receive the full message", ['RI1', 'RT7', 'RA7']),
-    TestCase(send_message_to_unknown, "chat_011", "Send message to non-existent user and expect failure", ['RI1', 'RT7', 'RI9']),
-    TestCase(verify_file_for_sendall, "chat_012", "A client must not use the sendall() function in Python", ['RI1', 'RT7', 'RT2']),
-    TestCase(error_body,  "chat_013", "Last message received from the client contains an error in the body", ['RI1', 'RT7', 'R13']),
-    TestCase(quit_after_log_in, "chat_014", "A client can exit after log in", ['RI1', 'RT7', 'RC1', 'RA8']),    
-    TestCase(quit_before_log_in, "chat_015", "A client can exit before log in", ['RI1', 'RT7', 'RC1', 'RA8']),
-    TestCase(check_message_concurrency, "chat_016", "Send message from C1 and then send 2-3 messages to client C1 from C2. Check those are displayed straight away", ['RI1', 'RT7', 'RT6']),
-    TestCase(check_message_delay, "chat_017", "Send a delayed message to delaybot and expect it to print out correctly", ['RT3', 'RT5', 'RT7'])
+    TestCase(log_in, "chat_002", "Log in with unique name and expect success message", ['RI1', 'RT7', 'RI3'], requires=['chat_001']),
+    TestCase(check_name, "chat_003", "A client must inform the user if their username was rejected for any other reason and ask for a new username - forbidden symbols (!@#$%^&*)", ['RI1', 'RT7', 'RA4', 'RT1'], requires=['chat_001']),
+    TestCase(log_in_duplicate, "chat_004", "Log in with duplicate name and expect in use messsage", ['RI1', 'RT7', 'RA2', 'RI4'], requires=['chat_002']),
+    TestCase(not_restart_failed_attempt, "chat_005", "Expect client to not restart after a failed log in attempt", ['RI1', 'RT7', 'RA6'], requires=['chat_002']),
+    TestCase(test_busy, "chat_006", "Log in with busy server, expect failure, and shut client down gracefully", ['RI1', 'RT7', 'RI6'], max_clients=0, requires=['chat_001']),
+    TestCase(list_users, "chat_007", "List users and expect success", ['RI1', 'RT7', 'RC2', 'RI11'], requires=['chat_002']),
+    TestCase(test_simple_exchange, "chat_008", "Send message to other user and expect success", ['RI1', 'RT7', 'RI2', 'RI8', 'RI10'], requires=['chat_002']),
+    TestCase(test_longer_exchange_messages, "chat_009", "Send long message to other user and expect success", ['RI1', 'RT7', 'RI2', 'RI8', 'RI10'], requires=['chat_002']),
+    TestCase(exchange_message_echobot,"chat_010", "A client should be able to send a message to echobot and receive the full message", ['RI1', 'RT7', 'RA7'], requires=['chat_002']),
+    TestCase(send_message_to_unknown, "chat_011", "Send message to non-existent user and expect failure", ['RI1', 'RT7', 'RI9'], requires=['chat_002']),
+    harness.StaticTestCase(verify_file_for_sendall, "chat_012", "A client must not use the sendall() function in Python", ['RI1', 'RT7', 'RT2']),
+    TestCase(error_body,  "chat_013", "Last message received from the client contains an error in the body", ['RI1', 'RT7', 'R13'], requires=['chat_002']),
+    TestCase(quit_after_log_in, "chat_014", "A client can exit after log in", ['RI1', 'RT7', 'RC1', 'RA8'], requires=['chat_002']),    
+    TestCase(quit_before_log_in, "chat_015", "A client can exit before log in", ['RI1', 'RT7', 'RC1', 'RA8'], requires=['chat_001']),
+    TestCase(check_message_concurrency, "chat_016", "Send message from C1 and then send 2-3 messages to client C1 from C2. Check those are displayed straight away", ['RI1', 'RT7', 'RT6'], requires=['chat_002']),
+    TestCase(check_message_delay, "chat_017", "Send a delayed message to delaybot and expect it to print out correctly", ['RT3', 'RT5', 'RT7'], requires=['chat_002'])
+]
+
+benchmark_cases = [
+    TestCase(delivery_flood, "chat_bench_001", "Client shows a flood of messages and keeps handling input", ['load']),
 ]
 
+def main():
+    global USE_JAVA_SERVER
 
-parser = argparse.ArgumentParser(description='Process test arguments')
+    parser = harness.build_argument_parser()
+    parser.add_argument('--javaserver', action='store_true', help='(optional) test against ChatServer.jar and EchoBot.jar instead of the built-in reference server')
+    parser.add_argument('--benchmarks', action='store_true', help='Run the load and performance benchmarks instead of the tests')
+    parser.add_argument('--flooddeliveries', type=int, help='Number of messages the server pushes to the client in the flood benchmark', default=FLOOD_SETTINGS['deliveries'])
+    parser.add_argument('--floodrate', type=int, help='Messages per second the server pushes to the client in the flood benchmark', default=FLOOD_SETTINGS['rate'])
+    args = parser.parse_args()
 
-parser.add_argument('--case', type=str, help='Test case name', default=None)
-parser.add_argument('--tags', type=str, help='List of tags', default=None)
-parser.add_argument('--disablecolors', type=bool, help='(is used only for printing formatting in codegrade)', default=False)
-args = parser.parse_args()
+    if args.flooddeliveries < 1:
+        parser.error('--flooddeliveries must be at least 1')
 
-case = args.case
-disable_colors = args.disablecolors
+    USE_JAVA_SERVER = args.javaserver
+    harness.set_timeout_scale(args.timeoutscale)
+    harness.enable_network_isolation(args.isolate)
 
-if args.tags:
-    try:
-        tags_list = json.loads(args.tags.replace("'", "\""))
-    except json.JSONDecodeError as e:
-        print(f"Error parsing tags: {e}")
-        tags_list = None
-else:
-    tags_list = None
-
-def execute_tests(test_cases, case, tags_list):
-    SUCCESS = True
-    for test in test_cases:
-        if tags_list is not None and len([tag for tag in test.tags if tag in tags_list]) > 0 and case is None:
-            if not test.execute(disable_colors=disable_colors):
-                SUCCESS = False
-        elif case is not None and case == test.test_id:
-            if not test.execute(disable_colors=disable_colors):
-                SUCCESS = False
-            break
-        elif case is None and tags_list is None:
-            if not test.execute(disable_colors=disable_colors):
-                SUCCESS = False
-        else:
-            continue
-    
-    return SUCCESS
+    FLOOD_SETTINGS.update(deliveries=args.flooddeliveries, rate=args.floodrate)
+
+    result_cache = harness.ResultCache(STUDENT_FILE_PATH, __file__, options={'java_server': USE_JAVA_SERVER}) if args.incremental and not args.benchmarks else None
 
+    if not harness.execute_tests(benchmark_cases if args.benchmarks else test_cases, args.case, harness.parse_tags(args.tags), args.disablecolors, args.workers, args.timingreport, args.resources, result_cache):
+        exit(1)
+    else:
+        exit(0)
 
-if not execute_tests(test_cases=test_cases, case=case, tags_list=tags_list):
-    exit(1)
-else:
-    exit(0)
+if __name__ == '__main__':
+    main()
@@ -1,75 +1,21 @@
-from pexpect.exceptions import TIMEOUT as TimeoutException, EOF as EndOfFileException
-import json
 import pexpect
-import argparse
+import os
+import sys
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import harness
+from harness import TestException, execute_and_detach, execute_and_wait
+
 SERVER_ADDRESS = '127.0.0.1'
-SERVER_PORT = 8000
+DEFAULT_SERVER_PORT = 8000
+SERVER_PORT = DEFAULT_SERVER_PORT
 IPV4ONLY = False
 STUDENT_FILE_PATH = "../student/dns_check/dns.py"
 
-class TestException(Exception):
-    pass
-
-def get_last_printed_line(output_buffer):
-    last_printed_line = '[EMPTY LINE. PROGRAM DID NOT PRODUCE ANY OUTPUT]'
-    lines = output_buffer.split('\n')
-
-    for line in reversed(lines):
-        if line.strip():
-            last_printed_line = line
-            break
-
-    return last_printed_line
-
-def handle_pexpect(child_process, processes_to_terminate, expect_string, output_buffer, step, timeout=1, display_expect_string=''):
-    try:
-        child_process.expect(expect_string, timeout=timeout)
-        output_buffer += child_process.before + child_process.after
-
-    except TimeoutException:
-        output_buffer += child_process.before
-        last_printed_line = get_last_printed_line(output_buffer)
-
-        for process in processes_to_terminate:
-            process.terminate(force=True)
-
-        if display_expect_string:
-            expect_string = display_expect_string
-
-        raise TestException(f'unexpected output at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    except EndOfFileException:
-        if type(child_process.before) == 'str':
-            output_buffer += child_process.before
-        
-        if type(child_process.after) == 'str':
-            output_buffer += child_process.after
-        
-        last_printed_line = get_last_printed_line(output_buffer)
-
-        for process in processes_to_terminate:
-            process.terminate(force=True)
-            
-        raise TestException(f'program has unexpectidly terminated at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    
-    return output_buffer
-
 def start_server():
-    return execute_and_detach(f'python3 {STUDENT_FILE_PATH} --ipv4only {IPV4ONLY} --address {SERVER_ADDRESS} --port {SERVER_PORT}')
-
-
-def execute_and_detach(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    return child
-
-def execute_and_wait(cmd):
-    process = pexpect.spawn('/bin/sh', ['-c', cmd], encoding='utf-8')
-    process.expect(pexpect.EOF)
-    output = process.before  # Capture the output
-    process.wait()
-
-    return process.exitstatus, output
+    return harness.watch_process(execute_and_detach(f'python3 {STUDENT_FILE_PATH} --ipv4only {IPV4ONLY} --address {SERVER_ADDRESS} --port {SERVER_PORT}'))
 
 def test_simple():
     website_list = ['microsoft.com', 'google.com', 'vk.com', 'amazon.com', 'yahoo.com']
@@ -115,42 +61,36 @@ def test_caching():
         if time_difference_2 >= time_difference_1:
             raise TestException(f'execution of first (uncached) request to fetch the address of {website} took as much or more time as the execution of second (cached) request. Make sure your server implements caching')
 
-class TestCase():
+class TestCase(harness.TestCase):
+    # the DNS server has to reach the upstream servers, which an isolated namespace cannot do
+    isolatable = False
+
     def __init__(self, test_func, test_id, test_msg, tags=[], max_clients=300) -> None:
-        self.tags = tags
-        self.test_func = test_func
-        self.test_id = test_id
-        self.test_msg = test_msg
+        super().__init__(test_func, test_id, test_msg, tags)
         self.max_clients = max_clients
-    
-    def execute(self, disable_colors=False):
-        success = True
+
+    @property
+    def exclusive(self):
+        return not harness.ephemeral_ports_enabled()
+
+    def start_environment(self):
+        global SERVER_PORT
+        SERVER_PORT = harness.allocate_port(DEFAULT_SERVER_PORT, SERVER_ADDRESS, udp=True)
+
         server_process = start_server()
-        time.sleep(5)  # give server some time for a start-up and determining the fastest server
+        harness.wait_for_dns(SERVER_ADDRESS, SERVER_PORT, timeout=10)  # start-up includes determining the fastest server
+
+        return [server_process]
+
+    def describe_failure(self, error, processes):
+        server_process = processes[0]
 
         try:
-            self.test_func()
-            
-            if not disable_colors:
-                print(f'\033[92m[ \u2713 ] \033[30m{self.test_id}. {self.test_msg}. \033[92mSuccess! \033[0m')
-            else:
-                print(f'[ \u2713 ] {self.test_id}. {self.test_msg}. Success!')
-        except Exception as e:
-            tags_string = ' '.join(self.tags)
-            try:
-                server_process.expect(pexpect.EOF, timeout=0)
-            except:
-                pass
-
-            if not disable_colors:
-                print(f'\033[91m[ x ] \033[30m{self.test_id}. {self.test_msg} \033[91mFailed! \033[30m The list of tags is {tags_string} \nError message is {e} \nThe server output is {server_process.before} \033[0m')
-            else:
-                print(f'[ x ] {self.test_id}. {self.test_msg} Failed! The list of tags is {tags_string} \nError message is {e} \nThe server output is {server_process.before}')
-            
-            success = False
-
-        return success
+            server_process.expect(pexpect.EOF, timeout=0)
+        except:
+            pass
 
+        return f'{error} \nThe server output is {harness.OutputCapture(server_process.before)}'
 
 test_cases = [
     TestCase(test_simple, "dns_001", "DNS with A and AAAA records", ['PR1', 'PR2', 'RR1', 'RR2', 'RR3', 'RR5']),
@@ -158,50 +98,27 @@ test_cases = [
     TestCase(test_caching, "dns_003", "Server implements caching", ['CR1']),
 ]
 
+def main():
+    global IPV4ONLY
 
-parser = argparse.ArgumentParser(description='Process test arguments')
-
-parser.add_argument('--case', type=str, help='Test case name', default=None)
-parser.add_argument('--tags', type=str, help='List of tags', default=None)
-parser.add_argument('--disablecolors', type=bool, help='(is used only for printing formatting in codegrade)', default=False)
-parser.add_argument('--ipv4only', type=bool, help='mac setting as docker does not support ipv6 on mac', default=False)
-args = parser.parse_args()
-
-case = args.case
-disable_colors = args.disablecolors
-
-if args.tags:
-    try:
-        tags_list = json.loads(args.tags.replace("'", "\""))
-    except json.JSONDecodeError as e:
-        print(f"Error parsing tags: {e}")
-        tags_list = None
-else:
-    tags_list = None
-
-if args.ipv4only:
-    IPV4ONLY = True
-
-def execute_tests(test_cases, case, tags_list):
-    SUCCESS = True
-    for test in test_cases:
-        if tags_list is not None and len([tag for tag in test.tags if tag in tags_list]) > 0 and case is None:
-            if not test.execute(disable_colors=disable_colors):
-                SUCCESS = False
-        elif case is not None and case == test.test_id:
-            if not test.execute(disable_colors=disable_colors):
-                SUCCESS = False
-            break
-        elif case is None and tags_list is None:
-            if not test.execute(disable_colors=disable_colors):
-                SUCCESS = False
-        else:
-            continue
-    
-    return SUCCESS
+    # the DNS server has to reach the upstream servers, which an isolated namespace cannot do
+    parser = harness.build_argument_parser(network_isolation=False)
+    parser.add_argument('--ipv4only', type=bool, help='mac setting as docker does not support ipv6 on mac', default=False)
+    parser.add_argument('--ephemeralports', action='store_true', help='(optional) give every test case its own free port. Your server must use the --address and --port arguments')
+    args = parser.parse_args()
+
+    harness.set_timeout_scale(args.timeoutscale)
+    harness.enable_ephemeral_ports(args.ephemeralports)
+
+    if args.ipv4only:
+        IPV4ONLY = True
+
+    result_cache = harness.ResultCache(STUDENT_FILE_PATH, __file__, options={'ipv4only': IPV4ONLY}) if args.incremental else None
 
+    if not harness.execute_tests(test_cases, args.case, harness.parse_tags(args.tags), args.disablecolors, args.workers, args.timingreport, args.resources, result_cache):
+        exit(1)
+    else:
+        exit(0)
 
-if not execute_tests(test_cases=test_cases, case=case, tags_list=tags_list):
-    exit(1)
-else:
-    exit(0)
+if __name__ == '__main__':
+    main()
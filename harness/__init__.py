@@ -0,0 +1,33 @@
+from harness.batch import ASSIGNMENTS, grade_submissions, write_results
+from harness.build_cache import build_go_binary
+from harness.capture import OutputCapture, case_log_path, set_log_directory
+from harness.chat_benchmarks import BLOCKS_GLOBALLY, BLOCKS_PER_CLIENT, BUFFERS_WITHOUT_LIMIT, DISCONNECTS_SLOW_CLIENT, LEAK_SLACK, LINEAR_FROM, measure_churn, measure_idle_scaling, measure_message_sizes, measure_pipelining, measure_slow_reader, measure_soak, measure_user_table
+from harness.client_benchmarks import measure_delivery_flood
+from harness.chat_protocol import ChatSession, ConnectionClosed, close_sessions, connect_silent_client, log_in_sessions, open_sessions, run_sessions
+from harness.core import (
+    DEFAULT_FAILURE_PATTERNS,
+    EMPTY_OUTPUT_MESSAGE,
+    TestException,
+    execute_and_collect_output,
+    execute_and_detach,
+    execute_and_wait,
+    expect_messages_in_order,
+    generate_message,
+    generate_name,
+    get_last_printed_line,
+    handle_pexpect,
+    kill_process_group,
+    set_timeout_scale,
+    timeout_scale,
+)
+from harness.load import PATTERNS, LoadRecorder, latency_summary, plan_destinations, run_load, unique_names
+from harness.netns import enable_network_isolation, enter_network_namespace, network_isolation_enabled
+from harness.ports import allocate_port, enable_ephemeral_ports, ephemeral_ports_enabled, find_free_port
+from harness.readiness import ChatProbe, tcp_is_open, wait_for_condition, wait_for_dns, wait_for_output, wait_for_tcp, wait_for_user_removed
+from harness.reference_chat import ReferenceChatServer
+from harness.resources import ResourceMonitor, file_limit, format_usage, growth_slope, raise_file_limit, read_process_usage, watch_process
+from harness.result_cache import ResultCache
+from harness.static_analysis import SENDALL, SLEEP_IN_RECEIVE_LOOP, UNBOUNDED_RECEIVE_LOOP, StaticTestCase, analyze_file, analyze_source, check_student_file
+from harness.scheduler import build_argument_parser, execute_tests, parse_tags, run_test_cases, select_test_cases
+from harness.testcase import TestCase, TestResult, add_metrics, add_note, format_metrics, print_result
+from harness.timing import build_timing_report, write_timing_report
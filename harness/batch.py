@@ -0,0 +1,113 @@
+import importlib
+import json
+import os
+
+from harness.scheduler import run_test_cases, select_test_cases
+from harness.timing import write_timing_report
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ASSIGNMENTS = ['chat_client_check', 'server_check', 'unreliable_chat_check', 'http_server_check', 'dns_check']
+
+class GradingUnit():
+    # One test case of one assignment for one submission. Units run in forked workers,
+    # so pointing the suite module at the submission only affects the current unit.
+    def __init__(self, submission, assignment, suite, test_case, student_file_path) -> None:
+        self.submission = submission
+        self.assignment = assignment
+        self.suite = suite
+        self.test_case = test_case
+        self.student_file_path = student_file_path
+
+    @property
+    def exclusive(self):
+        return self.test_case.exclusive
+
+    @property
+    def static(self):
+        return self.test_case.static
+
+    @property
+    def isolatable(self):
+        return self.test_case.isolatable
+
+    @property
+    def key(self):
+        return (self.submission, self.assignment, self.test_case.test_id)
+
+    @property
+    def requires(self):
+        return [(self.submission, self.assignment, test_id) for test_id in self.test_case.requires]
+
+    def skip(self, reason):
+        return self.test_case.skip(reason)
+
+    def run(self):
+        os.chdir(os.path.join(REPOSITORY_PATH, self.assignment))
+        self.suite.STUDENT_FILE_PATH = self.student_file_path
+
+        return self.test_case.run(os.path.join(self.submission, self.assignment, self.test_case.test_id))
+
+def load_suite(assignment):
+    return importlib.import_module(f'{assignment}.check')
+
+def collect_units(submissions_path, assignments, case=None, tags_list=None):
+    suites = {assignment: load_suite(assignment) for assignment in assignments}
+    units = []
+    missing = []
+
+    for submission in sorted(os.listdir(submissions_path)):
+        if not os.path.isdir(os.path.join(submissions_path, submission)):
+            continue
+
+        for assignment in assignments:
+            suite = suites[assignment]
+            student_file_path = os.path.abspath(os.path.join(submissions_path, submission, assignment, os.path.basename(suite.STUDENT_FILE_PATH)))
+
+            if not os.path.isfile(student_file_path):
+                missing.append((submission, assignment))
+                continue
+
+            for test_case in select_test_cases(suite.test_cases, case, tags_list):
+                units.append(GradingUnit(submission, assignment, suite, test_case, student_file_path))
+
+    return units, missing
+
+def grade_submissions(submissions_path, assignments=ASSIGNMENTS, case=None, tags_list=None, workers=1, timing_report=None):
+    units, missing = collect_units(submissions_path, assignments, case, tags_list)
+    results = {}
+    named_results = []
+
+    for submission, assignment in missing:
+        results.setdefault(submission, {})[assignment] = {'missing': True, 'passed': 0, 'failed': 0, 'cases': []}
+
+    current_dir = os.getcwd()
+
+    try:
+        for unit, result in zip(units, run_test_cases(units, workers)):
+            assignment_results = results.setdefault(unit.submission, {}).setdefault(unit.assignment, {'missing': False, 'passed': 0, 'failed': 0, 'cases': []})
+            assignment_results['passed' if result.success else 'failed'] += 1
+            named_results.append((f'{unit.submission}/{unit.assignment}/{result.test_id}', result))
+            assignment_results['cases'].append({
+                'test_id': result.test_id,
+                'test_msg': result.test_msg,
+                'tags': result.tags,
+                'success': result.success,
+                'skipped': result.skipped,
+                'error_message': result.error_message,
+                'timings': result.timings,
+                'resources': result.resources,
+                'notes': result.notes,
+                'metrics': result.metrics,
+            })
+    finally:
+        os.chdir(current_dir)
+
+    if timing_report:
+        write_timing_report(named_results, timing_report)
+
+    return {submission: {assignment: results[submission][assignment] for assignment in assignments if assignment in results[submission]} for submission in sorted(results)}
+
+def write_results(results, output_path):
+    with open(output_path, 'w') as file:
+        json.dump({'submissions': results}, file, indent=2)
@@ -0,0 +1,41 @@
+import fcntl
+import hashlib
+import os
+import subprocess
+
+from harness.core import TestException
+
+def cache_directory():
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+
+    return os.environ.get('CN_LAB_CACHE_DIR', os.path.join(cache_home, 'cn-lab-harness'))
+
+def source_digest(source_path):
+    with open(source_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def build_go_binary(source_path, cache_dir=None):
+    # binaries are keyed by the source hash, so an edited server is rebuilt on its next use
+    cache_dir = cache_dir or cache_directory()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    binary_path = os.path.join(cache_dir, f'{name}-{source_digest(source_path)[:16]}')
+
+    if os.path.isfile(binary_path):
+        return binary_path
+
+    # parallel workers wait for the one that builds instead of compiling the same file again
+    with open(f'{binary_path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        if not os.path.isfile(binary_path):
+            partial_path = f'{binary_path}.{os.getpid()}.partial'
+            build = subprocess.run(['go', 'build', '-o', partial_path, os.path.abspath(source_path)], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding='utf-8')
+
+            if build.returncode != 0:
+                raise TestException(f'could not build {source_path}:\n{build.stdout}')
+
+            os.replace(partial_path, binary_path)
+
+    return binary_path
@@ -0,0 +1,83 @@
+import os
+import tempfile
+
+HEAD_LIMIT = 4096
+TAIL_LIMIT = 8192
+
+_log_directory = os.environ.get('CN_LAB_LOG_DIR', os.path.join(tempfile.gettempdir(), 'cn-lab-logs'))
+_log_path = None
+
+def set_log_directory(path):
+    global _log_directory
+    _log_directory = path
+
+def begin_case(log_name):
+    # every case streams the output it captures into one transcript, which starts empty on every run
+    global _log_path
+    _log_path = os.path.join(_log_directory, f'{log_name}.log')
+
+    os.makedirs(os.path.dirname(_log_path), exist_ok=True)
+    open(_log_path, 'w').close()
+
+def case_log_path():
+    return _log_path
+
+class OutputCapture():
+    # Program output that keeps only its head and tail in memory. Appending returns a new capture,
+    # so it can replace the plain strings the suites pass around without one step changing another.
+    def __init__(self, text='', head_limit=HEAD_LIMIT, tail_limit=TAIL_LIMIT) -> None:
+        self.head_limit = head_limit
+        self.tail_limit = tail_limit
+        self.head = ''
+        self.tail = ''
+        self.length = 0
+        self.log_path = case_log_path()
+
+        self._append(str(text))
+
+    @classmethod
+    def wrap(cls, output):
+        return output if isinstance(output, cls) else cls(output)
+
+    def _append(self, text):
+        if not text:
+            return
+
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8', errors='replace') as file:
+                file.write(text)
+
+        self.length += len(text)
+
+        if len(self.head) < self.head_limit:
+            taken = text[:self.head_limit - len(self.head)]
+            self.head += taken
+            text = text[len(taken):]
+
+        self.tail = (self.tail + text)[-self.tail_limit:]
+
+    def __add__(self, text):
+        capture = OutputCapture.__new__(OutputCapture)
+        capture.__dict__.update(self.__dict__)
+        capture._append(str(text))
+
+        return capture
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def truncated(self):
+        return self.length > len(self.head) + len(self.tail)
+
+    def last_text(self):
+        return self.tail if self.truncated else self.head + self.tail
+
+    def __str__(self):
+        if not self.truncated:
+            return self.head + self.tail
+
+        omitted = self.length - len(self.head) - len(self.tail)
+        location = f', the full output is in {self.log_path}' if self.log_path else ''
+
+        return f'{self.head}\n\n[... {omitted} characters omitted{location} ...]\n\n{self.tail}'
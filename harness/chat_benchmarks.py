@@ -0,0 +1,741 @@
+import asyncio
+import random
+import string
+import time
+
+from harness.chat_protocol import ChatSession, ConnectionClosed, close_sessions, connect_silent_client
+from harness.core import TestException, generate_message, generate_name, timeout_scale
+from harness.load import TICK, LoadRecorder, latency_summary, log_in_load_clients, plan_destinations, send_load, start_collecting, stop_collecting, unique_names, wait_for_deliveries
+from harness.readiness import ChatProbe, wait_for_condition
+from harness.resources import file_limit, growth_slope, read_process_usage
+
+ACTIVE_CLIENTS = 4
+ACTIVE_RATE = 100
+PHASE_DURATION = 3
+
+FLOOD_MESSAGE_SIZE = 4096
+FLOOD_LIMIT = 64 * 2 ** 20
+# far more than the socket buffers of the slow client can hold, so the server keeps it in its own memory
+UNBOUNDED_BUFFERING = 16 * 2 ** 20
+
+PIPELINE_BATCHES = [1000, 4000, 16000]
+PIPELINE_MESSAGE_SIZE = 48
+PIPELINE_TIMEOUT = 30
+# the time per line may grow this much from the smallest to the largest batch before it counts as quadratic
+QUADRATIC_GROWTH = 3
+FRAGMENTED_LINES = 20
+FRAGMENT_DELAY = 0.001
+
+CHURN_CLIENTS = 8
+CHURN_CYCLES = 25
+NAME_FREE_TIMEOUT = 5
+RETRY_DELAY = 0.01
+SETTLE_TIMEOUT = 5
+# the server may keep a few descriptors around, for example for a log file it opens lazily
+LEAK_SLACK = 4
+
+SOAK_DURATION = 60
+SOAK_OPERATIONS = 100000
+SOAK_CLIENTS = 8
+SOAK_MESSAGES = 5
+SOAK_SAMPLE_INTERVAL = 0.5
+# RSS that keeps growing by more than this over the second half of the soak counts as a leak
+SOAK_RSS_GROWTH_KB = 8 * 1024
+
+IDLE_STEPS = [0, 100, 500, 1000, 2500, 5000, 10000]
+IDLE_CONNECTIONS = 10000
+IDLE_BATCH = 200
+IDLE_LOGGED_IN_EVERY = 10
+IDLE_ACTIVE_RATE = 50
+IDLE_PHASE = 2
+# descriptors the harness keeps for itself when it decides how many idle connections it can open
+FD_RESERVE = 512
+# the latency knee is the first idle count where the p99 latency is this many times the one without idle connections
+KNEE_FACTOR = 5
+
+USER_TABLE_STEPS = [1, 10, 16, 100, 500, 1000, 2500, 5000]
+USER_TABLE_SIZE = 5000
+USER_TABLE_SAMPLES = 10
+REPLY_TIMEOUT = 5
+
+MESSAGE_SIZES = [2 ** 10, 2 ** 12, 2 ** 14, 2 ** 16, 2 ** 18, 2 ** 20, 2 ** 22]
+LARGEST_MESSAGE = 2 ** 22
+MESSAGE_REPEATS = 3
+MESSAGE_TIMEOUT = 30
+# below this size the time per message is mostly overhead, so the growth per byte is measured from here on
+LINEAR_FROM = 2 ** 16
+# looking for the newline in the whole buffer after every recv() already grows a little, copying it grows far more
+MESSAGE_QUADRATIC_GROWTH = 5
+
+BLOCKS_GLOBALLY = 'blocks globally'
+BLOCKS_PER_CLIENT = 'blocks per client'
+BUFFERS_WITHOUT_LIMIT = 'buffers without limit'
+DISCONNECTS_SLOW_CLIENT = 'disconnects the slow client'
+
+def current_rss_kb(pid):
+    usage = read_process_usage(pid) if pid else None
+    return usage['rss_kb'] if usage else None
+
+async def sample_rss(pid, samples, interval=0.1):
+    while True:
+        rss = current_rss_kb(pid)
+        if rss is not None:
+            samples.append(rss)
+
+        await asyncio.sleep(interval)
+
+async def count_replies(session, counts):
+    try:
+        while True:
+            reply = await session.next_reply(timeout=None)
+            header = reply.split(' ', 1)[0]
+            counts[header] = counts.get(header, 0) + 1
+    except ConnectionClosed:
+        pass
+
+async def flood(session, destination, duration, limit=FLOOD_LIMIT, message_size=FLOOD_MESSAGE_SIZE):
+    # sends as fast as the server reads and returns how many bytes it took
+    line = f'SEND {destination} {generate_message(message_size, message_size)}'
+    deadline = time.monotonic() + duration
+    written = 0
+
+    while written < limit and time.monotonic() < deadline and not session.closed:
+        session.send_line(line)
+        written += len(line) + 1
+
+        try:
+            await asyncio.wait_for(session.drain(), max(deadline - time.monotonic(), 0.001))
+        except (asyncio.TimeoutError, OSError):
+            break
+
+    return written
+
+def list_users_or_none(address, port):
+    # a server that is stuck cannot answer, which is an answer as well
+    try:
+        probe = ChatProbe(address, port)
+    except OSError:
+        return None
+
+    try:
+        return probe.list_users()
+    except OSError:
+        return None
+    finally:
+        probe.close()
+
+def phase_metrics(prefix, report):
+    return {
+        f'{prefix}_per_second': report['delivered_per_second'],
+        f'{prefix}_p50': report['latency_p50'],
+        f'{prefix}_p99': report['latency_p99'],
+        f'{prefix}_lost': report['lost'],
+    }
+
+async def measure_slow_reader(address, port, server_pid=None, phase_duration=PHASE_DURATION):
+    # A few clients exchange messages while nobody stalls, and again while another client floods a
+    # user that stopped reading. The second phase against the first shows what the slow reader costs.
+    names = unique_names(ACTIVE_CLIENTS + 2)
+    active_names, flooder_name, stalled_name = names[:ACTIVE_CLIENTS], names[ACTIVE_CLIENTS], names[ACTIVE_CLIENTS + 1]
+    destinations = plan_destinations(ACTIVE_CLIENTS, 'one-to-one')
+
+    sessions = await log_in_load_clients(address, port, active_names + [flooder_name])
+    active, flooder = sessions[:ACTIVE_CLIENTS], sessions[ACTIVE_CLIENTS]
+
+    baseline = LoadRecorder()
+    collectors = start_collecting(active, baseline)
+    await send_load(active, active_names, destinations, baseline, ACTIVE_RATE, phase_duration)
+    await wait_for_deliveries(baseline, active)
+    await stop_collecting(collectors)
+
+    rss_before = current_rss_kb(server_pid)
+    stalled_socket = await asyncio.to_thread(connect_silent_client, address, port, stalled_name)
+
+    try:
+        stalled = LoadRecorder()
+        stalled.next_sequence = baseline.next_sequence
+        flood_replies = {}
+        rss_samples = []
+
+        helpers = start_collecting(active, stalled) + [
+            asyncio.get_running_loop().create_task(count_replies(flooder, flood_replies)),
+            asyncio.get_running_loop().create_task(sample_rss(server_pid, rss_samples)),
+        ]
+        flooding = asyncio.get_running_loop().create_task(flood(flooder, stalled_name, phase_duration))
+
+        await send_load(active, active_names, destinations, stalled, ACTIVE_RATE, phase_duration)
+        written = await flooding
+        await wait_for_deliveries(stalled, active)
+        await stop_collecting(helpers)
+
+        listed = await asyncio.to_thread(list_users_or_none, address, port)
+    finally:
+        stalled_socket.close()
+
+    baseline_report = baseline.report()
+    stalled_report = stalled.report()
+    accepted = flood_replies.get('SEND-OK', 0) * FLOOD_MESSAGE_SIZE
+    slow_p99 = max(1.0, 10 * (baseline_report['latency_p99'] or 0))
+
+    if stalled_report['delivered'] < 0.9 * stalled_report['sent'] or (stalled_report['latency_p99'] or 0) > slow_p99:
+        behaviour = BLOCKS_GLOBALLY
+    elif flood_replies.get('BAD-DEST-USER') or (listed is not None and stalled_name not in listed):
+        behaviour = DISCONNECTS_SLOW_CLIENT
+    elif accepted > UNBOUNDED_BUFFERING:
+        behaviour = BUFFERS_WITHOUT_LIMIT
+    else:
+        behaviour = BLOCKS_PER_CLIENT
+
+    return dict(
+        phase_metrics('baseline', baseline_report),
+        **phase_metrics('stalled', stalled_report),
+        flood_written_kb=written // 1024,
+        flood_accepted_kb=accepted // 1024,
+        server_rss_growth_kb=max(rss_samples) - rss_before if rss_samples and rss_before is not None else None,
+        behaviour=behaviour,
+    )
+
+async def pipeline_batch(sender, receiver, count, message_size=PIPELINE_MESSAGE_SIZE, timeout=PIPELINE_TIMEOUT):
+    # all lines go out in one write, so thousands of them share a TCP segment
+    recorder = LoadRecorder()
+    lines = [f'SEND {receiver.name} {recorder.message(sequence, message_size)}\n' for sequence in range(count)]
+    collectors = start_collecting([sender, receiver], recorder)
+
+    started = time.monotonic()
+    for sequence in range(count):
+        recorder.record_send(sequence)
+
+    sender.send_bytes(''.join(lines).encode('utf-8'))
+    deadline = started + timeout * timeout_scale()
+
+    while (recorder.sent or recorder.replies < count) and time.monotonic() < deadline and not sender.closed and not receiver.closed:
+        await asyncio.sleep(TICK)
+
+    elapsed = time.monotonic() - started
+    await stop_collecting(collectors)
+
+    return elapsed, recorder
+
+async def measure_pipelining(address, port, batches=PIPELINE_BATCHES):
+    sender_name, receiver_name = unique_names(2)
+    sender, receiver = await log_in_load_clients(address, port, [sender_name, receiver_name])
+    metrics = {}
+    problems = []
+    per_line = []
+
+    for count in batches:
+        elapsed, recorder = await pipeline_batch(sender, receiver, count)
+        report = recorder.report()
+
+        metrics[f'batch_{count}_lines_per_second'] = round(count / elapsed)
+        metrics[f'batch_{count}_us_per_line'] = round(elapsed / count * 1e6, 1)
+        per_line.append(elapsed / count)
+
+        if report['lost'] or recorder.replies < count or recorder.errors:
+            problems.append(f'of {count} pipelined SEND lines, {report["delivered"]} were delivered and {recorder.replies} were answered{", for example " + recorder.errors[0] if recorder.errors else ""}')
+            break
+
+    metrics['per_line_growth'] = round(per_line[-1] / per_line[0], 2)
+    metrics['quadratic'] = len(per_line) == len(batches) and per_line[-1] > QUADRATIC_GROWTH * per_line[0]
+
+    if not problems:
+        messages = [generate_message(PIPELINE_MESSAGE_SIZE, PIPELINE_MESSAGE_SIZE) for _ in range(FRAGMENTED_LINES)]
+        started = time.monotonic()
+
+        for message in messages:
+            # one byte per write, and asyncio sets TCP_NODELAY, so every byte is a segment of its own
+            for byte in f'SEND {receiver_name} {message}\n'.encode('utf-8'):
+                sender.send_bytes(bytes([byte]))
+                await sender.drain()
+                await asyncio.sleep(FRAGMENT_DELAY)
+
+            await sender.expect_reply('SEND-OK', 'sending a SEND line one byte at a time')
+
+        await receiver.expect_deliveries(sender_name, messages, 'receiving messages that were sent one byte at a time', 5)
+        metrics['fragmented_lines'] = FRAGMENTED_LINES
+        metrics['fragmented_seconds'] = round(time.monotonic() - started, 3)
+
+    return metrics, problems
+
+def server_state(address, port, pid):
+    # the open descriptors of the server and the users it lists, both seen through one probe connection
+    users = list_users_or_none(address, port)
+    usage = read_process_usage(pid) if pid else None
+
+    return (usage['fds'] if usage else None), users
+
+async def churn_client(address, port, name, cycles, results):
+    closed_at = None
+
+    for _ in range(cycles):
+        while True:
+            session = ChatSession(address, port)
+            await session.connect('connecting a churning client')
+            reply = await session.log_in(name, f'logging in the churning client {name}', expected='')
+
+            if reply.startswith('HELLO'):
+                break
+
+            await session.close()
+
+            if not reply.startswith('IN-USE') or closed_at is None or time.monotonic() - closed_at > NAME_FREE_TIMEOUT * timeout_scale():
+                results['failures'].append(f'logging in as {name} was answered with {reply!r}')
+                return
+
+            results['retries'] += 1
+            await asyncio.sleep(RETRY_DELAY)
+
+        if closed_at is not None:
+            results['name_free'].append(time.monotonic() - closed_at)
+
+        results['sessions'] += 1
+
+        # the same as !quit in the client
+        await session.close()
+        closed_at = time.monotonic()
+
+async def measure_churn(address, port, server_pid=None, clients=CHURN_CLIENTS, cycles=CHURN_CYCLES):
+    # Every client logs in with the same name again right after it quit, so the time until the
+    # name is accepted again shows how quickly the server notices a closed connection.
+    fds_before, users_before = await asyncio.to_thread(server_state, address, port, server_pid)
+    names = unique_names(clients)
+    results = {'sessions': 0, 'retries': 0, 'name_free': [], 'failures': []}
+
+    started = time.monotonic()
+    await asyncio.gather(*(churn_client(address, port, name, cycles, results) for name in names))
+    elapsed = time.monotonic() - started
+
+    # the server gets some time to clean up after the last clients
+    state = [fds_before, users_before]
+
+    def settled():
+        state[:] = server_state(address, port, server_pid)
+        fds, users = state
+        return (fds is None or fds_before is None or fds <= fds_before) and users is not None and not set(names) & set(users)
+
+    await asyncio.to_thread(wait_for_condition, settled, SETTLE_TIMEOUT * timeout_scale(), 0.2)
+    fds_after, users_after = state
+    summary = latency_summary(results['name_free'])
+
+    return dict(
+        clients=clients,
+        cycles=cycles,
+        sessions=results['sessions'],
+        sessions_per_second=round(results['sessions'] / elapsed, 1),
+        in_use_retries=results['retries'],
+        name_free_p50=summary['latency_p50'],
+        name_free_p99=summary['latency_p99'],
+        leaked_fds=fds_after - fds_before if fds_after is not None and fds_before is not None else None,
+        leaked_users=len(set(names) & set(users_after)) if users_after is not None else None,
+    ), results['failures']
+
+async def sample_usage(pid, samples, started, interval=SOAK_SAMPLE_INTERVAL):
+    while True:
+        usage = read_process_usage(pid) if pid else None
+        if usage is not None:
+            samples.append((time.monotonic() - started, usage))
+
+        await asyncio.sleep(interval)
+
+async def soak_client(address, port, sink_name, results, deadline, rate, started):
+    # one user at a time logs in, sends a few messages and quits, paced so all clients together
+    # spread their operations over the whole soak
+    while time.monotonic() < deadline and results['operations'] < results['target'] and not results['failures']:
+        ahead = results['operations'] - (time.monotonic() - started) * rate
+        if ahead > 0:
+            await asyncio.sleep(min(ahead / rate, 1))
+            continue
+
+        session = ChatSession(address, port)
+        await session.connect('connecting a soak client')
+
+        try:
+            session.send_line(f'HELLO-FROM {generate_name()}')
+            reply = await session.next_reply(timeout=5 * timeout_scale())
+
+            for _ in range(SOAK_MESSAGES if reply.startswith('HELLO') else 0):
+                session.send_line(f'SEND {sink_name} {generate_message(16, 32)}')
+                reply = await session.next_reply(timeout=5 * timeout_scale())
+
+                if not reply.startswith('SEND-OK'):
+                    break
+
+                results['sent'] += 1
+        except (asyncio.TimeoutError, ConnectionClosed):
+            reply = 'no reply'
+
+        await session.close()
+        results['operations'] += 2 + SOAK_MESSAGES
+
+        if not reply.startswith('HELLO') and not reply.startswith('SEND-OK'):
+            results['failures'].append(f'a soak client got {reply!r} after {results["operations"]} operations')
+
+def usage_growth(samples, key):
+    # only the second half counts, the first one includes the server warming up
+    settled = samples[len(samples) // 2:]
+    return growth_slope(settled, key), (settled[-1][1][key] - settled[0][1][key]) if settled else 0
+
+async def measure_soak(address, port, server_pid=None, duration=SOAK_DURATION, operations=SOAK_OPERATIONS):
+    fds_before, _ = await asyncio.to_thread(server_state, address, port, server_pid)
+    threads_before = (read_process_usage(server_pid) or {}).get('threads') if server_pid else None
+
+    sink_name = unique_names(1)[0]
+    sink = ChatSession(address, port)
+    await sink.connect('connecting the soak receiver')
+    await sink.log_in(sink_name, 'logging in the soak receiver')
+
+    results = {'operations': 0, 'target': operations, 'sent': 0, 'delivered': 0, 'failures': []}
+    samples = []
+    started = time.monotonic()
+
+    async def receive():
+        try:
+            while True:
+                await sink.next_delivery(timeout=None)
+                results['delivered'] += 1
+        except ConnectionClosed:
+            pass
+
+    helpers = [asyncio.get_running_loop().create_task(receive()), asyncio.get_running_loop().create_task(sample_usage(server_pid, samples, started))]
+    rate = operations / duration
+    await asyncio.gather(*(soak_client(address, port, sink_name, results, started + duration, rate, started) for _ in range(SOAK_CLIENTS)))
+    elapsed = time.monotonic() - started
+
+    deadline = time.monotonic() + SETTLE_TIMEOUT * timeout_scale()
+    while results['delivered'] < results['sent'] and time.monotonic() < deadline and not sink.closed:
+        await asyncio.sleep(TICK)
+
+    await stop_collecting(helpers)
+    await sink.close()
+
+    # leaked descriptors and threads stay behind once every client is gone
+    def settled():
+        usage = read_process_usage(server_pid) if server_pid else None
+        return usage is None or ((fds_before is None or usage['fds'] <= fds_before) and (threads_before is None or usage['threads'] <= threads_before))
+
+    await asyncio.to_thread(wait_for_condition, settled, SETTLE_TIMEOUT * timeout_scale(), 0.2)
+    after = read_process_usage(server_pid) if server_pid else None
+
+    rss_slope, rss_growth = usage_growth(samples, 'rss_kb')
+    fds_slope, _ = usage_growth(samples, 'fds')
+    threads_slope, _ = usage_growth(samples, 'threads')
+
+    metrics = dict(
+        seconds=round(elapsed, 1),
+        operations=results['operations'],
+        operations_per_second=round(results['operations'] / elapsed, 1),
+        messages_sent=results['sent'],
+        messages_lost=results['sent'] - results['delivered'],
+        samples=len(samples),
+        rss_start_kb=samples[0][1]['rss_kb'] if samples else None,
+        rss_end_kb=samples[-1][1]['rss_kb'] if samples else None,
+        rss_slope_kb_per_minute=round(rss_slope, 1),
+        fds_slope_per_minute=round(fds_slope, 2),
+        threads_slope_per_minute=round(threads_slope, 2),
+        leaked_fds=after['fds'] - fds_before if after and fds_before is not None else None,
+        leaked_threads=after['threads'] - threads_before if after and threads_before is not None else None,
+    )
+
+    problems = list(results['failures'])
+
+    if metrics['messages_lost']:
+        problems.append(f'{metrics["messages_lost"]} of {metrics["messages_sent"]} messages were not delivered')
+
+    if rss_slope > 0 and rss_growth > SOAK_RSS_GROWTH_KB:
+        problems.append(f'the memory of the server kept growing by {rss_growth} KiB in the second half of the run ({metrics["rss_slope_kb_per_minute"]} KiB per minute)')
+
+    for resource in ('fds', 'threads'):
+        if metrics[f'leaked_{resource}'] is not None and metrics[f'leaked_{resource}'] > LEAK_SLACK:
+            problems.append(f'the server had {metrics[f"leaked_{resource}"]} more {"file descriptors" if resource == "fds" else "threads"} after every client had quit')
+
+    return metrics, problems
+
+async def open_idle_connections(address, port, count, logged_in_every=IDLE_LOGGED_IN_EVERY):
+    # connects in batches, so the listen backlog of the server does not overflow, and logs in every n-th one
+    sessions = []
+    failed = 0
+
+    for start in range(0, count, IDLE_BATCH):
+        batch = [ChatSession(address, port) for _ in range(min(IDLE_BATCH, count - start))]
+        results = await asyncio.gather(*(session.connect('opening idle connections') for session in batch), return_exceptions=True)
+
+        for session, result in zip(batch, results):
+            if isinstance(result, BaseException):
+                failed += 1
+                await session.close()
+            else:
+                sessions.append(session)
+
+    logging_in = sessions[::logged_in_every]
+    replies = await asyncio.gather(*(session.log_in(generate_name(), 'logging in idle connections', expected='', timeout=5) for session in logging_in), return_exceptions=True)
+    logged_in = len([reply for reply in replies if isinstance(reply, str) and reply.startswith('HELLO')])
+
+    return sessions, failed, logged_in
+
+async def measure_idle_scaling(address, port, server_pid=None, idle_connections=IDLE_CONNECTIONS):
+    # The active clients log in first, so idle users cannot fill up the server before them.
+    largest = max(min(idle_connections, file_limit() - FD_RESERVE), 0)
+    steps = sorted({step for step in IDLE_STEPS if step <= largest} | {largest})
+
+    names = unique_names(ACTIVE_CLIENTS)
+    destinations = plan_destinations(ACTIVE_CLIENTS, 'one-to-one')
+    active = await log_in_load_clients(address, port, names)
+
+    idle = []
+    metrics = {}
+    problems = []
+    baseline_p99 = None
+    sequence = 0
+    totals = {'failed': 0, 'logged_in': 0}
+
+    try:
+        for step in steps:
+            opened, failed, logged_in = await open_idle_connections(address, port, step - len(idle) - totals['failed'])
+            idle += opened
+            totals['failed'] += failed
+            totals['logged_in'] += logged_in
+
+            recorder = LoadRecorder()
+            recorder.next_sequence = sequence
+            collectors = start_collecting(active, recorder)
+            await send_load(active, names, destinations, recorder, IDLE_ACTIVE_RATE, IDLE_PHASE)
+            await wait_for_deliveries(recorder, active)
+            await stop_collecting(collectors)
+            sequence = recorder.next_sequence
+
+            report = recorder.report()
+            usage = read_process_usage(server_pid) if server_pid else None
+
+            metrics[f'idle_{step}_p50'] = report['latency_p50']
+            metrics[f'idle_{step}_p99'] = report['latency_p99']
+            metrics[f'idle_{step}_server_threads'] = usage['threads'] if usage else None
+
+            if baseline_p99 is None:
+                baseline_p99 = max(report['latency_p99'] or 0, 0.001)
+            elif 'knee_idle_connections' not in metrics and (report['latency_p99'] or 0) > KNEE_FACTOR * baseline_p99:
+                metrics['knee_idle_connections'] = step
+
+            if any(session.closed for session in active):
+                problems.append(f'the connections of the active clients were closed with {len(idle)} idle connections open')
+                break
+
+            if report['lost']:
+                problems.append(f'with {len(idle)} idle connections open, {report["lost"]} of {report["sent"]} messages between the active clients were not delivered')
+                break
+
+        metrics['idle_closed_by_server'] = len([session for session in idle if session.closed])
+    finally:
+        await close_sessions(idle)
+
+    metrics.setdefault('knee_idle_connections', None)
+    metrics.update(idle_opened=len(idle), idle_failed=totals['failed'], idle_logged_in=totals['logged_in'])
+
+    return metrics, problems
+
+async def timed_reply(session, line, timeout=REPLY_TIMEOUT):
+    started = time.monotonic()
+    session.send_line(line)
+    reply = await session.next_reply(timeout * timeout_scale())
+
+    return time.monotonic() - started, reply
+
+async def sample_logins(address, port, names):
+    # every login gets a connection of its own, which is closed again right away
+    samples = []
+
+    for name in names:
+        session = ChatSession(address, port)
+        await session.connect('connecting a client to time its login')
+
+        try:
+            samples.append(await timed_reply(session, f'HELLO-FROM {name}'))
+        except (asyncio.TimeoutError, ConnectionClosed):
+            samples.append((None, 'no reply'))
+
+        await session.close()
+
+    return samples
+
+async def login_reply(session, name):
+    session.name = name
+
+    try:
+        return (await timed_reply(session, f'HELLO-FROM {name}'))[1]
+    except (asyncio.TimeoutError, ConnectionClosed):
+        return None
+
+async def grow_user_table(address, port, users, names, size):
+    # returns True once the server answers BUSY
+    while len(users) < size:
+        batch = unique_names(min(IDLE_BATCH, size - len(users)))
+        sessions = [ChatSession(address, port) for _ in batch]
+
+        await asyncio.gather(*(session.connect('connecting users to fill the user table') for session in sessions))
+        replies = await asyncio.gather(*(login_reply(session, name) for session, name in zip(sessions, batch)))
+
+        if None in replies:
+            raise TestException(f'{replies.count(None)} of {len(batch)} logins got no reply within {REPLY_TIMEOUT * timeout_scale()} seconds')
+
+        for session, name, reply in zip(sessions, batch, replies):
+            if reply.startswith('HELLO'):
+                users.append(session)
+                names.append(name)
+            else:
+                await session.close()
+
+        if any(reply.startswith('BUSY') for reply in replies):
+            return True
+
+        unexpected = [reply for reply in replies if not reply.startswith('HELLO')]
+        if unexpected:
+            raise TestException(f'logging in users to fill the user table was answered with {unexpected[0]!r}')
+
+    return False
+
+def p50_of(samples, reply_header):
+    latencies = [latency for latency, reply in samples if latency is not None and reply.startswith(reply_header)]
+    return latency_summary(latencies)['latency_p50']
+
+async def measure_user_table(address, port, size=USER_TABLE_SIZE):
+    # Grows the user table step by step. At every size, an observer times LIST and new connections time
+    # logging in with a free name and with a taken one. Servers that cap the number of users stop the
+    # growth with BUSY, and the size they reached is reported.
+    largest = max(min(size, file_limit() - FD_RESERVE), 1)
+    steps = sorted({step for step in USER_TABLE_STEPS if step <= largest} | {largest})
+
+    observer_name = unique_names(1)[0]
+    observer = ChatSession(address, port)
+    await observer.connect('connecting the observer')
+    await observer.log_in(observer_name, 'logging in the observer')
+
+    users = [observer]
+    names = [observer_name]
+    metrics = {}
+    problems = []
+    full = False
+    baseline = None
+
+    for step in steps:
+        try:
+            full = await grow_user_table(address, port, users, names, step)
+        except TestException as e:
+            problems.append(f'growing the user table from {len(users)} to {step} users failed: {e}')
+            break
+
+        count = len(users)
+
+        try:
+            list_samples = [await timed_reply(observer, 'LIST') for _ in range(USER_TABLE_SAMPLES)]
+        except asyncio.TimeoutError:
+            problems.append(f'LIST with {count} users got no reply within {REPLY_TIMEOUT * timeout_scale()} seconds')
+            break
+        except ConnectionClosed:
+            problems.append(f'the server closed the connection of the observer after LIST with {count} users')
+            break
+
+        listed = list_samples[-1][1][len('LIST-OK'):].strip().split(',')
+        missing = set(names) - set(listed)
+
+        metrics[f'users_{count}_list_p50'] = p50_of(list_samples, 'LIST-OK')
+        metrics[f'users_{count}_list_bytes'] = len(list_samples[-1][1])
+        logins = await sample_logins(address, port, [names[-1]] * USER_TABLE_SAMPLES)
+        metrics[f'users_{count}_in_use_p50'] = p50_of(logins, 'IN-USE')
+
+        if not full:
+            new_logins = await sample_logins(address, port, unique_names(USER_TABLE_SAMPLES))
+            logins += new_logins
+
+            # A server capped at exactly this size never answered BUSY while the table grew. Only the first
+            # sample counts, later ones can meet a sample login the server has not removed yet.
+            if new_logins[0][1].startswith('BUSY'):
+                full = True
+            else:
+                metrics[f'users_{count}_hello_p50'] = p50_of(new_logins, 'HELLO')
+
+        # a name lookup that scans every user makes logging in slower as the table grows
+        in_use = metrics[f'users_{count}_in_use_p50']
+        baseline = baseline or in_use
+        if baseline and in_use and 'knee_login_users' not in metrics and in_use > KNEE_FACTOR * baseline:
+            metrics['knee_login_users'] = count
+
+        if any(latency is None for latency, _ in logins):
+            problems.append(f'logging in with {count} users got no reply within {REPLY_TIMEOUT * timeout_scale()} seconds')
+            break
+
+        if missing:
+            problems.append(f'LIST did not contain {len(missing)} of the {count} logged in users, for example {sorted(missing)[0]}')
+            break
+
+        if full:
+            metrics['user_table_limit'] = count
+            break
+
+    metrics.setdefault('user_table_limit', None)
+    metrics.setdefault('knee_login_users', None)
+    metrics['largest_user_table'] = len(users)
+
+    return metrics, problems
+
+def large_message(index, size):
+    # a random block repeated, because drawing every one of several million characters takes seconds
+    prefix = f'{index} '
+    block = ''.join(random.choice(string.ascii_letters) for _ in range(1024))
+
+    return prefix + (block * (size // len(block) + 1))[:max(size - len(prefix), 1)]
+
+async def send_large_message(sender, receiver, message, timeout=MESSAGE_TIMEOUT):
+    started = time.monotonic()
+    sender.send_line(f'SEND {receiver.name} {message}')
+    await sender.drain()
+
+    reply = await sender.next_reply(timeout * timeout_scale())
+    _, delivered, arrived = await receiver.next_delivery(timeout * timeout_scale())
+
+    return reply, delivered, arrived - started
+
+async def measure_message_sizes(address, port, largest=LARGEST_MESSAGE):
+    # Sends one message at a time, so the latency is the time the server needs to take in a line of
+    # this size and write it out again. A server that glues every recv() onto its buffer by copying it
+    # takes time that grows with the square of the line length.
+    sizes = sorted({size for size in MESSAGE_SIZES if size < largest} | {largest})
+    names = unique_names(2)
+    sender, receiver = await log_in_load_clients(address, port, names)
+    metrics = {}
+    problems = []
+    per_byte = {}
+
+    for size in sizes:
+        latencies = []
+
+        for index in range(MESSAGE_REPEATS):
+            message = large_message(index, size)
+
+            try:
+                reply, delivered, latency = await send_large_message(sender, receiver, message)
+            except asyncio.TimeoutError:
+                problems.append(f'a message of {size} bytes was not delivered within {MESSAGE_TIMEOUT * timeout_scale()} seconds')
+                break
+            except ConnectionClosed:
+                problems.append(f'the server closed a connection while a message of {size} bytes was sent')
+                break
+
+            if not reply.startswith('SEND-OK') or delivered != message:
+                problems.append(f'a message of {size} bytes was answered with {reply[:80]!r} and delivered as {len(delivered)} bytes')
+                break
+
+            latencies.append(latency)
+
+        if problems:
+            break
+
+        latency = latency_summary(latencies)['latency_p50']
+        metrics[f'size_{size}_latency_p50'] = latency
+        metrics[f'size_{size}_mb_per_second'] = round(size / max(latency, 1e-6) / 2 ** 20, 1)
+        per_byte[size] = max(latency, 1e-6) / size
+
+    measured = [size for size in per_byte if size >= LINEAR_FROM]
+    metrics['largest_delivered'] = max(per_byte) if per_byte else 0
+    metrics['per_byte_growth'] = round(per_byte[measured[-1]] / per_byte[measured[0]], 2) if len(measured) > 1 else None
+    metrics['quadratic'] = bool(metrics['per_byte_growth'] and metrics['per_byte_growth'] > MESSAGE_QUADRATIC_GROWTH)
+
+    return metrics, problems
@@ -0,0 +1,240 @@
+import asyncio
+import socket
+import time
+
+from harness.core import TestException, timeout_scale
+from harness.timing import record_step
+
+LINE_LIMIT = 2 ** 24
+
+# every session of the running test case, so they can be closed when it ends
+_sessions = []
+
+class ConnectionClosed(Exception):
+    pass
+
+class ChatSession():
+    # One simulated user that speaks the chat protocol over its own socket. DELIVERY lines can arrive at
+    # any time, so they are queued apart from the replies to HELLO-FROM, SEND and LIST.
+    def __init__(self, address, port) -> None:
+        self.address = address
+        self.port = port
+        self.name = None
+        self.received = []
+        self.closed = False
+
+        self.replies = asyncio.Queue()
+        self.deliveries = asyncio.Queue()
+
+        self._reader = None
+        self._writer = None
+        self._receiver = None
+
+        _sessions.append(self)
+
+    async def connect(self, step='connecting to the server', timeout=5):
+        started = time.monotonic()
+
+        try:
+            self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.address, self.port, limit=LINE_LIMIT), timeout * timeout_scale())
+        except (OSError, asyncio.TimeoutError) as e:
+            record_step(step, started, 'eof')
+            raise TestException(f'could not connect to the server at {self.address}:{self.port} at step {step}! ({e or "timed out"})\nPlease check you are starting your server at the correct address and port and that your server uses the reuse option BEFORE binding to the port')
+
+        record_step(step, started, 'matched')
+        self._receiver = asyncio.get_running_loop().create_task(self._receive())
+
+        return self
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+
+                text = line.decode('utf-8', errors='replace').rstrip('\r\n')
+                self.received.append(text)
+
+                if text.startswith('DELIVERY '):
+                    _, sender, message = (text.split(' ', 2) + [''])[:3]
+                    self.deliveries.put_nowait((sender, message, time.monotonic()))
+                else:
+                    self.replies.put_nowait(text)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.closed = True
+            self.replies.put_nowait(None)
+            self.deliveries.put_nowait(None)
+
+    async def _next(self, queue, timeout):
+        item = await asyncio.wait_for(queue.get(), timeout)
+
+        if item is None:
+            # keep the marker for whoever reads next
+            queue.put_nowait(None)
+            raise ConnectionClosed()
+
+        return item
+
+    def transcript(self, limit=20):
+        lines = self.received[-limit:]
+        return '\n'.join(lines) if lines else '[NOTHING RECEIVED]'
+
+    def send_line(self, line):
+        self.send_bytes(f'{line}\n'.encode('utf-8'))
+
+    def send_bytes(self, data):
+        # raw protocol bytes, for example many lines at once or a part of one line
+        if self._writer is None or self._writer.is_closing():
+            raise TestException(f'the connection of {self.name or "the client"} is already closed')
+
+        self._writer.write(data)
+
+    async def drain(self):
+        await self._writer.drain()
+
+    async def expect_reply(self, expected, step, timeout=1):
+        started = time.monotonic()
+
+        try:
+            reply = await self._next(self.replies, timeout * timeout_scale())
+        except asyncio.TimeoutError:
+            record_step(step, started, 'timeout')
+            raise TestException(f'no reply from the server at step {step}!\nExpected a reply starting with:\n\n{expected}\n\nLines received by {self.name or "the client"}:\n\n{self.transcript()}')
+        except ConnectionClosed:
+            record_step(step, started, 'eof')
+            raise TestException(f'the server closed the connection at step {step}!\nExpected a reply starting with:\n\n{expected}\n\nLines received by {self.name or "the client"}:\n\n{self.transcript()}')
+
+        if not reply.startswith(expected):
+            record_step(step, started, 'aborted')
+            raise TestException(f'unexpected reply at step {step}!\nExpected a reply starting with:\n\n{expected}\n\nThe server replied:\n\n{reply}')
+
+        record_step(step, started, 'matched')
+
+        return reply
+
+    async def log_in(self, name, step=None, expected='HELLO', timeout=3):
+        self.name = name
+        self.send_line(f'HELLO-FROM {name}')
+
+        return await self.expect_reply(expected, step or f'logging in as {name}', timeout)
+
+    async def send_message(self, destination, message, step=None, expected='SEND-OK', timeout=1):
+        self.send_line(f'SEND {destination} {message}')
+
+        return await self.expect_reply(expected, step or f'sending a message from {self.name} to {destination}', timeout)
+
+    async def list_users(self, step='listing the logged in users', timeout=1):
+        self.send_line('LIST')
+        reply = await self.expect_reply('LIST-OK', step, timeout)
+
+        return [name for name in reply[len('LIST-OK'):].strip().split(',') if name]
+
+    async def next_reply(self, timeout=1):
+        # like next_delivery, for the replies that are not checked with expect_reply
+        return await self._next(self.replies, timeout)
+
+    async def next_delivery(self, timeout=1):
+        # returns (sender, message, arrival time) and raises asyncio.TimeoutError or ConnectionClosed
+        return await self._next(self.deliveries, timeout)
+
+    async def expect_deliveries(self, sender, messages, step, timeout=1):
+        # the messages have to arrive in order and nothing else may arrive in between
+        started = time.monotonic()
+        deadline = started + timeout * timeout_scale()
+
+        for index, message in enumerate(messages):
+            try:
+                delivered_by, delivered, _ = await self._next(self.deliveries, max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                record_step(step, started, 'timeout')
+                raise TestException(f'message {index + 1} of {len(messages)} was not delivered at step {step}!\nExpected:\n\nDELIVERY {sender} {message}\n\nLines received by {self.name}:\n\n{self.transcript()}')
+            except ConnectionClosed:
+                record_step(step, started, 'eof')
+                raise TestException(f'the server closed the connection before message {index + 1} of {len(messages)} was delivered at step {step}!\nExpected:\n\nDELIVERY {sender} {message}\n\nLines received by {self.name}:\n\n{self.transcript()}')
+
+            if (delivered_by, delivered) != (sender, message):
+                record_step(step, started, 'aborted')
+                raise TestException(f'messages were delivered out of order at step {step}!\nExpected message {index + 1} of {len(messages)}:\n\nDELIVERY {sender} {message}\n\nBut got:\n\nDELIVERY {delivered_by} {delivered}')
+
+        record_step(step, started, 'matched')
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+
+        if self._receiver is not None:
+            await asyncio.gather(self._receiver, return_exceptions=True)
+
+        if self in _sessions:
+            _sessions.remove(self)
+
+def connect_silent_client(address, port, name, receive_buffer=4096, timeout=3):
+    # A logged in user that never reads from its socket again. It is a plain socket instead of a
+    # ChatSession, because a session keeps reading in the background.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+    sock.settimeout(timeout * timeout_scale())
+    reply = b''
+
+    try:
+        sock.connect((address, port))
+        sock.sendall(f'HELLO-FROM {name}\n'.encode('utf-8'))
+
+        # one byte at a time, so nothing after the reply is read
+        while not reply.endswith(b'\n'):
+            byte = sock.recv(1)
+            if not byte:
+                break
+
+            reply += byte
+    except OSError as e:
+        sock.close()
+        raise TestException(f'could not log in the client {name} that stops reading: {e}')
+
+    if not reply.startswith(b'HELLO'):
+        sock.close()
+        raise TestException(f'could not log in the client {name} that stops reading, the server replied {reply!r}')
+
+    return sock
+
+async def open_sessions(address, port, count, step='connecting to the server', timeout=5):
+    sessions = [ChatSession(address, port) for _ in range(count)]
+    results = await asyncio.gather(*(session.connect(step, timeout) for session in sessions), return_exceptions=True)
+
+    return await _settle(sessions, results)
+
+async def log_in_sessions(sessions, names, step=None, timeout=3):
+    # all users log in at the same time, as a class full of students would
+    results = await asyncio.gather(*(session.log_in(name, step, timeout=timeout) for session, name in zip(sessions, names)), return_exceptions=True)
+
+    return await _settle(sessions, results)
+
+async def _settle(sessions, results):
+    failures = [result for result in results if isinstance(result, BaseException)]
+
+    if failures:
+        await close_sessions(sessions)
+        raise failures[0]
+
+    return sessions
+
+async def close_sessions(sessions):
+    await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+
+def run_sessions(coroutine):
+    async def run():
+        try:
+            return await coroutine
+        finally:
+            await close_sessions(list(_sessions))
+            _sessions.clear()
+
+    return asyncio.run(run())
@@ -0,0 +1,163 @@
+import concurrent.futures
+import re
+import time
+
+from pexpect.exceptions import TIMEOUT as TimeoutException, EOF as EndOfFileException
+
+from harness.core import TestException, timeout_scale
+from harness.load import latency_summary
+from harness.reference_chat import FLOODBOT_NAME
+
+FLOOD_DELIVERIES = 5000
+FLOOD_RATE = 2000
+FLOOD_MESSAGE_SIZE = 48
+# the user types a line this often while the flood is on
+INPUT_INTERVAL = 0.05
+QUIET_PROBES = 10
+PROBE_TIMEOUT = 5
+DISPLAY_TIMEOUT = 30
+READ_SIZE = 65536
+TICK = 0.01
+
+FLOOD_LINE = re.compile(rf'From {FLOODBOT_NAME}: (\d+) ')
+PROBE_LINE = re.compile(r'^SEND \S+ probe(\d+)$')
+
+class FloodWatcher():
+    # Reads the output of the client while the reference server floods it, and times the lines the user
+    # types by the moment the server receives them.
+    def __init__(self, process, server, name) -> None:
+        self.process = process
+        # pexpect waits 50 ms before every sendline, which would hide the time the client takes
+        self.process.delaybeforesend = None
+        self.server = server
+        self.name = name
+        self.displayed = {}
+        self.out_of_order = 0
+        self.typed = {}
+        self.output = []
+        self._pending = ''
+
+    def read(self, timeout=TICK):
+        try:
+            self._pending += self.process.read_nonblocking(READ_SIZE, timeout)
+        except TimeoutException:
+            return
+        except EndOfFileException:
+            raise TestException(f'the client exited while it received a flood of messages! Last printed lines:\n\n{self.transcript()}')
+
+        now = time.monotonic()
+        *lines, self._pending = self._pending.split('\n')
+
+        for line in lines:
+            line = line.rstrip('\r')
+            self.output = (self.output + [line])[-20:]
+            match = FLOOD_LINE.search(line)
+
+            if match:
+                sequence = int(match.group(1))
+                self.out_of_order += sequence != len(self.displayed)
+                self.displayed.setdefault(sequence, now)
+
+    def transcript(self):
+        return '\n'.join(self.output) if self.output else '[NOTHING PRINTED]'
+
+    def type_probe(self):
+        # the client sends the probe to itself, so it costs one more line of output like a real message would
+        number = len(self.typed)
+        self.typed[number] = time.monotonic()
+        self.process.sendline(f'@{self.name} probe{number}')
+
+        return number
+
+    def probe_latencies(self, numbers):
+        received = {}
+
+        for arrived, sender, line in list(self.server.requests):
+            match = PROBE_LINE.match(line)
+            if sender == self.name and match:
+                received.setdefault(int(match.group(1)), arrived)
+
+        return [received[number] - self.typed[number] for number in numbers if number in received]
+
+    def wait_for_probes(self, numbers, timeout=PROBE_TIMEOUT):
+        deadline = time.monotonic() + timeout * timeout_scale()
+
+        while len(self.probe_latencies(numbers)) < len(numbers) and time.monotonic() < deadline:
+            self.read()
+
+        return self.probe_latencies(numbers)
+
+def measure_delivery_flood(process, server, name, deliveries=FLOOD_DELIVERIES, rate=FLOOD_RATE, message_size=FLOOD_MESSAGE_SIZE):
+    # First times typed lines while nothing else happens, then again while the server pushes deliveries
+    # at the client, and measures how long every delivery takes to appear on the terminal.
+    if deliveries < 1:
+        raise ValueError('a flood needs at least one delivery')
+
+    watcher = FloodWatcher(process, server, name)
+    problems = []
+
+    quiet = []
+    for _ in range(QUIET_PROBES):
+        quiet.append(watcher.type_probe())
+        watcher.wait_for_probes(quiet[-1:])
+
+    quiet_latencies = watcher.probe_latencies(quiet)
+
+    written = []
+    flood = server.flood(name, deliveries, rate, written, message_size)
+    started = time.monotonic()
+    deadline = started + DISPLAY_TIMEOUT * timeout_scale()
+    next_probe = started
+    probes = []
+
+    while len(watcher.displayed) < deliveries and time.monotonic() < deadline:
+        if not flood.done() and time.monotonic() >= next_probe:
+            probes.append(watcher.type_probe())
+            next_probe += INPUT_INTERVAL
+
+        watcher.read()
+
+    try:
+        flood.result(PROBE_TIMEOUT * timeout_scale())
+    except concurrent.futures.TimeoutError:
+        # the server is stuck writing to a client that does not read fast enough
+        flood.cancel()
+        problems.append(f'the client did not keep up with the flood, the server could only write {len(written)} of {deliveries} messages to it')
+
+    written = list(written)
+    last_written = written[-1] if written else None
+    flood_latencies = watcher.wait_for_probes(probes)
+    display_latencies = [watcher.displayed[sequence] - written[sequence] for sequence in watcher.displayed if sequence < len(written)]
+
+    last_displayed = max(watcher.displayed.values(), default=None)
+    quiet_p50 = latency_summary(quiet_latencies)['latency_p50']
+    flood_input = latency_summary(flood_latencies)
+
+    metrics = dict({
+        'deliveries': deliveries,
+        'displayed': len(watcher.displayed),
+        'out_of_order': watcher.out_of_order,
+        'flood_seconds': round(last_written - started, 3) if last_written else None,
+        'display_seconds': round(last_displayed - started, 3) if last_displayed else None,
+        'displayed_per_second': round(len(watcher.displayed) / (last_displayed - started), 1) if last_displayed else None,
+        'display_lag': round(last_displayed - last_written, 3) if last_displayed and last_written else None,
+        'quiet_input_p50': quiet_p50,
+        'flood_input_p50': flood_input['latency_p50'],
+        'flood_input_p99': flood_input['latency_p99'],
+        'flood_input_max': flood_input['latency_max'],
+        'input_slowdown': round(flood_input['latency_p50'] / quiet_p50, 1) if quiet_p50 and flood_input['latency_p50'] else None,
+    }, **{f'display_{key}': value for key, value in latency_summary(display_latencies).items()})
+
+    if len(watcher.displayed) < deliveries:
+        problems.append(f'only {len(watcher.displayed)} of {deliveries} messages appeared within {DISPLAY_TIMEOUT * timeout_scale()} seconds. Last printed lines:\n\n{watcher.transcript()}')
+
+    if watcher.out_of_order:
+        problems.append(f'{watcher.out_of_order} messages appeared out of order or more than once')
+
+    if len(quiet_latencies) < len(quiet):
+        problems.append(f'{len(quiet) - len(quiet_latencies)} of the {len(quiet)} lines typed before the flood never reached the server')
+
+    if len(flood_latencies) < len(probes):
+        problems.append(f'{len(probes) - len(flood_latencies)} of the {len(probes)} lines typed during the flood never reached the server')
+
+    return metrics, problems
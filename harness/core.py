@@ -0,0 +1,244 @@
+import os
+import random
+import re
+import signal
+import string
+import time
+
+import pexpect
+from pexpect.exceptions import TIMEOUT as TimeoutException, EOF as EndOfFileException
+
+from harness.capture import OutputCapture
+from harness.timing import record_step, register_generated_name
+
+EMPTY_OUTPUT_MESSAGE = '[EMPTY LINE. PROGRAM DID NOT PRODUCE ANY OUTPUT]'
+
+# output that means a step can no longer succeed, so it fails right away instead of after its timeout
+DEFAULT_FAILURE_PATTERNS = ['Traceback (most recent call last):']
+PEER_CHECK_INTERVAL = 0.25
+
+_timeout_scale = float(os.environ.get('CN_LAB_TIMEOUT_SCALE', 1))
+
+class TestException(Exception):
+    pass
+
+def generate_name():
+    name = ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(8, 16)))
+    register_generated_name(name)
+
+    return name
+
+def generate_message(min_len=32, max_len=64):
+    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(min_len, max_len)))
+
+def get_last_printed_line(output_buffer, empty_output_message=EMPTY_OUTPUT_MESSAGE):
+    last_printed_line = empty_output_message
+    lines = str(output_buffer.last_text() if isinstance(output_buffer, OutputCapture) else output_buffer).split('\n')
+
+    for line in reversed(lines):
+        if line.strip():
+            last_printed_line = line
+            break
+
+    return last_printed_line
+
+def set_timeout_scale(scale):
+    global _timeout_scale
+    _timeout_scale = scale
+
+def timeout_scale():
+    return _timeout_scale
+
+def _compile_failure_patterns(failure_patterns):
+    return [re.compile(re.escape(pattern)) if isinstance(pattern, str) else pattern for pattern in failure_patterns]
+
+def _expect(child_process, pattern, timeout, failure_patterns, peers):
+    # Waits like expect, but gives up early: returns None on a match, or the reason to abort the step when
+    # the program prints a failure pattern or a peer process exits. Raises TIMEOUT and EOF like expect.
+    patterns = [pattern] + _compile_failure_patterns(failure_patterns)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        remaining = max(deadline - time.monotonic(), 0)
+
+        try:
+            index = child_process.expect(patterns, timeout=min(remaining, PEER_CHECK_INTERVAL) if peers else remaining)
+        except TimeoutException:
+            exited = [peer for peer in peers if not peer.isalive()]
+            if exited:
+                return f'a process the step depends on (pid {exited[0].pid}) has exited'
+
+            if time.monotonic() >= deadline:
+                raise
+
+            continue
+
+        if index == 0:
+            return None
+
+        return f'the program printed {child_process.after.strip()!r}'
+
+def _read_remaining_output(child_process, timeout=0.5):
+    # a traceback is printed over several lines, so the rest of it is collected for the error message
+    try:
+        child_process.expect(pexpect.EOF, timeout=timeout)
+    except TimeoutException:
+        pass
+
+    return child_process.before if isinstance(child_process.before, str) else ''
+
+def handle_pexpect(child_process, processes_to_terminate, expect_string, output_buffer, step, timeout=1, display_expect_string='', empty_output_message=EMPTY_OUTPUT_MESSAGE, failure_patterns=None, peers=[], started=None):
+    # started is the time the input that triggers the step was sent, steps that send one line right before can leave it out
+    output_buffer = OutputCapture.wrap(output_buffer)
+    failure_patterns = DEFAULT_FAILURE_PATTERNS if failure_patterns is None else failure_patterns
+    started = started or time.monotonic()
+
+    try:
+        abort_reason = _expect(child_process, expect_string, timeout * _timeout_scale, failure_patterns, peers)
+
+    except TimeoutException:
+        record_step(step, started, 'timeout')
+        output_buffer += child_process.before
+        last_printed_line = get_last_printed_line(output_buffer, empty_output_message)
+
+        for process in processes_to_terminate:
+            process.terminate(force=True)
+
+        if display_expect_string:
+            expect_string = display_expect_string
+
+        raise TestException(f'unexpected output at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
+    except EndOfFileException:
+        record_step(step, started, 'eof')
+
+        if isinstance(child_process.before, str):
+            output_buffer += child_process.before
+
+        if isinstance(child_process.after, str):
+            output_buffer += child_process.after
+
+        last_printed_line = get_last_printed_line(output_buffer, empty_output_message)
+
+        for process in processes_to_terminate:
+            process.terminate(force=True)
+
+        raise TestException(f'program has unexpectidly terminated at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
+
+    if abort_reason is not None:
+        record_step(step, started, 'aborted')
+
+        output_buffer += child_process.before
+
+        if isinstance(child_process.after, str):
+            output_buffer += child_process.after
+
+        output_buffer += _read_remaining_output(child_process)
+        last_printed_line = get_last_printed_line(output_buffer, empty_output_message)
+
+        if display_expect_string:
+            expect_string = display_expect_string
+
+        _fail_step(processes_to_terminate, f'unexpected output at step {step}!\nThe step was aborted because {abort_reason}.\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
+
+    output_buffer += child_process.before + child_process.after
+    record_step(step, started, 'matched')
+
+    return output_buffer
+
+def _fail_step(processes_to_terminate, description):
+    for process in processes_to_terminate:
+        process.terminate(force=True)
+
+    raise TestException(description)
+
+def expect_messages_in_order(child_process, processes_to_terminate, sender, messages, output_buffer, step, timeout=1, empty_output_message=EMPTY_OUTPUT_MESSAGE, failure_patterns=None, peers=[], started=None):
+    # Reads the output line by line instead of matching one regex against the whole buffer. Anything printed
+    # before the first message is ignored, but once it appears every printed line has to be the next message.
+    # A message is searched for in its line, so a prompt printed in front of it is fine.
+    expected_lines = [f'From {sender}: {message}' for message in messages]
+    patterns = [re.compile(rf'From\s+{re.escape(sender)}:\s+{re.escape(message)}\s*$') for message in messages]
+    failure_patterns = _compile_failure_patterns(DEFAULT_FAILURE_PATTERNS if failure_patterns is None else failure_patterns)
+    expected_output = '\n'.join(expected_lines)
+    deadline = time.monotonic() + timeout * _timeout_scale
+    started = started or time.monotonic()
+    matched = 0
+    output_buffer = OutputCapture.wrap(output_buffer)
+
+    while matched < len(patterns):
+        try:
+            abort_reason = _expect(child_process, '\n', max(deadline - time.monotonic(), 0), [], peers)
+        except TimeoutException:
+            record_step(step, started, 'timeout')
+            output_buffer += child_process.before
+            last_printed_line = get_last_printed_line(output_buffer, empty_output_message)
+
+            _fail_step(processes_to_terminate, f'unexpected output at step {step}!\nMessage {matched + 1} of {len(patterns)} did not appear within a program:\n\n{expected_lines[matched]}\n\nExpected output to appear within a program:\n\n{expected_output}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
+        except EndOfFileException:
+            record_step(step, started, 'eof')
+
+            if isinstance(child_process.before, str):
+                output_buffer += child_process.before
+
+            last_printed_line = get_last_printed_line(output_buffer, empty_output_message)
+
+            _fail_step(processes_to_terminate, f'program has unexpectidly terminated at step {step}!\nMessage {matched + 1} of {len(patterns)} did not appear within a program:\n\n{expected_lines[matched]}\n\nExpected output to appear within a program:\n\n{expected_output}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
+
+        line = ''
+
+        if abort_reason is not None:
+            output_buffer += child_process.before
+        else:
+            line = child_process.before
+            output_buffer += line + '\n'
+
+            if any(pattern.search(line) for pattern in failure_patterns):
+                abort_reason = f'the program printed {line.strip()!r}'
+
+        if abort_reason is not None:
+            record_step(step, started, 'aborted')
+            output_buffer += _read_remaining_output(child_process)
+            last_printed_line = get_last_printed_line(output_buffer, empty_output_message)
+
+            _fail_step(processes_to_terminate, f'unexpected output at step {step}!\nThe step was aborted because {abort_reason}.\nMessage {matched + 1} of {len(patterns)} did not appear within a program:\n\n{expected_lines[matched]}\n\nExpected output to appear within a program:\n\n{expected_output}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
+
+        if patterns[matched].search(line):
+            matched += 1
+        elif line.strip() and (matched > 0 or any(pattern.search(line) for pattern in patterns[matched + 1:])):
+            record_step(step, started, 'out-of-order')
+            _fail_step(processes_to_terminate, f'unexpected output at step {step}!\nExpected message {matched + 1} of {len(patterns)}:\n\n{expected_lines[matched]}\n\nbut the program printed:\n\n{line.strip()}\n\nExpected output to appear within a program:\n\n{expected_output}\n\nTotal program output:\n\n{output_buffer}')
+
+    record_step(step, started, 'matched')
+
+    return output_buffer
+
+def execute_and_wait(cmd):
+    process = pexpect.spawn('/bin/sh', ['-c', cmd], encoding='utf-8')
+    process.expect(pexpect.EOF)
+    output = process.before  # Capture the output
+    process.wait()
+
+    return process.exitstatus, output
+
+def execute_and_collect_output(cmd):
+    child = pexpect.spawn(cmd, encoding='utf-8')
+    while True:
+        try:
+            line = child.readline()
+            if not line:
+                break
+            yield line
+        except pexpect.EOF:
+            break
+
+def execute_and_detach(cmd, cwd=None):
+    child = pexpect.spawn(cmd, encoding='utf-8', cwd=cwd)
+    return child
+
+def kill_process_group(process):
+    # wrappers such as `go run` leave their child behind when only the wrapper is killed
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+    process.close(force=True)
@@ -0,0 +1,187 @@
+import asyncio
+import random
+import string
+import time
+
+from harness.chat_protocol import ConnectionClosed, log_in_sessions, open_sessions
+from harness.core import generate_name, timeout_scale
+from harness.timing import percentile
+
+PATTERNS = ['one-to-one', 'many-to-one', 'all-to-all']
+
+# messages due within one tick are sent together, so high rates do not depend on the precision of sleep()
+TICK = 0.01
+DRAIN_TIMEOUT = 5
+
+def unique_names(count):
+    names = set()
+    while len(names) < count:
+        names.add(generate_name())
+
+    return list(names)
+
+def plan_destinations(count, pattern):
+    # returns for every sender the list of receivers it cycles through
+    if count < 2:
+        raise ValueError('a load needs at least two sessions')
+
+    if pattern == 'one-to-one':
+        # fixed pairs, an odd one out talks to the first session
+        return [[index ^ 1] if index ^ 1 < count else [0] for index in range(count)]
+
+    if pattern == 'many-to-one':
+        return [[]] + [[0] for _ in range(1, count)]
+
+    if pattern == 'all-to-all':
+        return [[other for other in range(count) if other != index] for index in range(count)]
+
+    raise ValueError(f'unknown load pattern {pattern}, expected one of {", ".join(PATTERNS)}')
+
+def latency_summary(latencies):
+    if not latencies:
+        return {'latency_p50': None, 'latency_p99': None, 'latency_max': None}
+
+    return {
+        'latency_p50': round(percentile(latencies, 0.5), 6),
+        'latency_p99': round(percentile(latencies, 0.99), 6),
+        'latency_max': round(max(latencies), 6),
+    }
+
+class LoadRecorder():
+    # Matches every DELIVERY with the SEND that caused it by a sequence number at the start of the message.
+    def __init__(self) -> None:
+        self.sent = {}
+        self.latencies = []
+        self.errors = []
+        self.first_send = None
+        self.last_delivery = None
+        self.next_sequence = 0
+        self.replies = 0
+        self._padding = ''
+
+    def message(self, sequence, size):
+        # one random padding is reused, so building messages does not slow the sender down at high rates
+        length = max(size - len(str(sequence)) - 1, 1)
+        if len(self._padding) < length:
+            self._padding = ''.join(random.choice(string.ascii_letters) for _ in range(length))
+
+        return f'{sequence} {self._padding[:length]}'
+
+    def record_send(self, sequence):
+        now = time.monotonic()
+        self.sent[sequence] = now
+        self.first_send = self.first_send or now
+
+    def record_delivery(self, message, arrived):
+        sequence = message.split(' ', 1)[0]
+        sent = self.sent.pop(int(sequence), None) if sequence.isdigit() else None
+
+        if sent is None:
+            self.errors.append(f'unexpected delivery {message[:80]!r}')
+            return
+
+        self.latencies.append(arrived - sent)
+        self.last_delivery = arrived
+
+    def record_reply(self, reply):
+        self.replies += 1
+
+        if not reply.startswith('SEND-OK'):
+            self.errors.append(f'unexpected reply {reply[:80]!r}')
+
+    def report(self):
+        delivered = len(self.latencies)
+        window = (self.last_delivery - self.first_send) if delivered and self.last_delivery > self.first_send else 0
+
+        return dict({
+            'sent': delivered + len(self.sent),
+            'delivered': delivered,
+            'lost': len(self.sent),
+            'errors': len(self.errors),
+            'delivered_per_second': round(delivered / window, 1) if window else None,
+        }, **latency_summary(self.latencies))
+
+async def _collect(session, recorder):
+    async def deliveries():
+        while True:
+            _, message, arrived = await session.next_delivery(timeout=None)
+            recorder.record_delivery(message, arrived)
+
+    async def replies():
+        while True:
+            reply = await session.next_reply(timeout=None)
+            recorder.record_reply(reply)
+
+    try:
+        await asyncio.gather(deliveries(), replies())
+    except ConnectionClosed:
+        pass
+
+def start_collecting(sessions, recorder):
+    return [asyncio.get_running_loop().create_task(_collect(session, recorder)) for session in sessions]
+
+async def stop_collecting(collectors):
+    for collector in collectors:
+        collector.cancel()
+
+    await asyncio.gather(*collectors, return_exceptions=True)
+
+async def send_load(sessions, names, destinations, recorder, rate, duration, message_size=64):
+    # Open loop: messages go out on a fixed schedule whether or not the server keeps up, so a slow
+    # server shows up as latency instead of as a lower sending rate.
+    senders = [index for index in range(len(sessions)) if destinations[index]]
+    rounds = [0] * len(sessions)
+
+    started = time.monotonic()
+    sequence = recorder.next_sequence
+
+    while time.monotonic() - started < duration:
+        due = recorder.next_sequence + int((time.monotonic() - started) * rate) + 1
+
+        while sequence < due:
+            sender = senders[sequence % len(senders)]
+            receiver = destinations[sender][rounds[sender] % len(destinations[sender])]
+            rounds[sender] += 1
+
+            if not sessions[sender].closed:
+                sessions[sender].send_line(f'SEND {names[receiver]} {recorder.message(sequence, message_size)}')
+                recorder.record_send(sequence)
+
+            sequence += 1
+
+        await asyncio.sleep(TICK)
+
+    recorder.next_sequence = sequence
+
+async def wait_for_deliveries(recorder, sessions, timeout=DRAIN_TIMEOUT):
+    # gives the server some time to deliver what is still queued
+    deadline = time.monotonic() + timeout * timeout_scale()
+
+    while recorder.sent and time.monotonic() < deadline and not all(session.closed for session in sessions):
+        await asyncio.sleep(TICK)
+
+async def log_in_load_clients(address, port, names):
+    sessions = await open_sessions(address, port, len(names), 'connecting the load clients')
+
+    return await log_in_sessions(sessions, names, 'logging in the load clients')
+
+async def run_load(address, port, session_count, rate, duration, pattern='all-to-all', message_size=64):
+    destinations = plan_destinations(session_count, pattern)
+    names = unique_names(session_count)
+    sessions = await log_in_load_clients(address, port, names)
+
+    recorder = LoadRecorder()
+    collectors = start_collecting(sessions, recorder)
+
+    await send_load(sessions, names, destinations, recorder, rate, duration, message_size)
+    await wait_for_deliveries(recorder, sessions)
+    await stop_collecting(collectors)
+
+    return dict({
+        'pattern': pattern,
+        'sessions': session_count,
+        'rate': rate,
+        'duration': duration,
+        'message_size': message_size,
+        'disconnected': len([session for session in sessions if session.closed]),
+    }, **recorder.report()), recorder.errors
@@ -0,0 +1,72 @@
+import ctypes
+import fcntl
+import os
+import socket
+import struct
+
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+SIOCGIFFLAGS = 0x8913
+SIOCSIFFLAGS = 0x8914
+IFF_UP = 0x1
+
+_network_isolation = False
+
+def _unshare(flags):
+    libc = ctypes.CDLL(None, use_errno=True)
+
+    if libc.unshare(flags) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+def _write_file(path, content):
+    with open(path, 'w') as file:
+        file.write(content)
+
+def _bring_loopback_up():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        request = struct.pack('16sH', b'lo', 0)
+        flags = struct.unpack('16sH', fcntl.ioctl(sock, SIOCGIFFLAGS, request)[:18])[1]
+        fcntl.ioctl(sock, SIOCSIFFLAGS, struct.pack('16sH', b'lo', flags | IFF_UP))
+
+def enter_network_namespace():
+    # Moves the calling process into a fresh network namespace that only has a loopback interface.
+    # Every process spawned afterwards (reference servers, student programs, clients) shares it.
+    if os.geteuid() == 0:
+        _unshare(CLONE_NEWNET)
+    else:
+        uid, gid = os.geteuid(), os.getegid()
+
+        # unprivileged graders first become root inside their own user namespace
+        _unshare(CLONE_NEWUSER | CLONE_NEWNET)
+        _write_file('/proc/self/setgroups', 'deny')
+        _write_file('/proc/self/uid_map', f'0 {uid} 1')
+        _write_file('/proc/self/gid_map', f'0 {gid} 1')
+
+    _bring_loopback_up()
+
+def check_network_isolation():
+    pid = os.fork()
+
+    if pid == 0:
+        try:
+            enter_network_namespace()
+            os._exit(0)
+        except BaseException:
+            os._exit(1)
+
+    _, status = os.waitpid(pid, 0)
+
+    return os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+def enable_network_isolation(enabled=True):
+    global _network_isolation
+
+    if enabled and not check_network_isolation():
+        raise OSError('network namespaces are not available. Run the container with --cap-add=SYS_ADMIN or allow unprivileged user namespaces')
+
+    _network_isolation = enabled
+
+def network_isolation_enabled():
+    return _network_isolation
@@ -0,0 +1,36 @@
+import socket
+
+_ephemeral_ports = False
+
+def enable_ephemeral_ports(enabled=True):
+    global _ephemeral_ports
+    _ephemeral_ports = enabled
+
+def ephemeral_ports_enabled():
+    return _ephemeral_ports
+
+def find_free_port(address='127.0.0.1', udp=False, attempts=20):
+    for _ in range(attempts):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as tcp_socket:
+            tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            tcp_socket.bind((address, 0))
+            port = tcp_socket.getsockname()[1]
+
+            if not udp:
+                return port
+
+            # the DNS server listens on UDP, so the port has to be free for both protocols
+            try:
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+                    udp_socket.bind((address, port))
+                    return port
+            except OSError:
+                continue
+
+    raise OSError(f'could not find a free port on {address}')
+
+def allocate_port(default_port, address='127.0.0.1', udp=False):
+    if not _ephemeral_ports:
+        return default_port
+
+    return find_free_port(address, udp)
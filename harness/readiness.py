@@ -0,0 +1,130 @@
+import random
+import socket
+import string
+import struct
+import time
+
+import pexpect
+
+def wait_for_condition(condition, timeout, interval=0.05):
+    deadline = time.monotonic() + timeout
+
+    while True:
+        if condition():
+            return True
+
+        if time.monotonic() >= deadline:
+            return False
+
+        time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+
+def tcp_is_open(address, port, timeout=0.5):
+    try:
+        with socket.create_connection((address, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def wait_for_tcp(address, port, timeout=5, interval=0.05):
+    return wait_for_condition(lambda: tcp_is_open(address, port, interval * 10), timeout, interval)
+
+def build_dns_query(name, query_id, record_type=1):
+    header = struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    question = b''.join(bytes([len(label)]) + label.encode() for label in name.split('.')) + b'\x00'
+
+    return header + question + struct.pack('!HH', record_type, 1)
+
+def dns_answers(address, port, name='example.com', timeout=0.5):
+    query_id = random.randint(0, 0xffff)
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+
+        try:
+            sock.sendto(build_dns_query(name, query_id), (address, port))
+
+            while True:
+                reply, _ = sock.recvfrom(4096)
+                if len(reply) >= 2 and struct.unpack('!H', reply[:2])[0] == query_id:
+                    return True
+        except OSError:
+            return False
+
+def wait_for_dns(address, port, timeout=10, name='example.com'):
+    # any reply to the probe counts, including errors, because it proves the server reads its socket
+    return wait_for_condition(lambda: dns_answers(address, port, name), timeout, interval=0.1)
+
+def wait_for_output(process, pattern, count=1, timeout=5):
+    # returns how many times the pattern was printed before the deadline or the end of the output
+    deadline = time.monotonic() + timeout
+    seen = 0
+
+    while seen < count:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        try:
+            process.expect(pattern, timeout=remaining)
+            seen += 1
+        except (pexpect.TIMEOUT, pexpect.EOF):
+            break
+
+    return seen
+
+class ChatProbe():
+    # A minimal chat protocol session that the harness uses to observe the server state.
+    def __init__(self, address, port, timeout=1) -> None:
+        self.name = 'probe' + ''.join(random.choice(string.ascii_letters) for _ in range(8))
+        self.sock = socket.create_connection((address, port), timeout=timeout)
+        self.reader = self.sock.makefile('r', encoding='utf-8', newline='\n')
+
+        self.sock.sendall(f'HELLO-FROM {self.name}\n'.encode())
+        reply = self.reader.readline()
+
+        if not reply.startswith('HELLO'):
+            self.close()
+            raise OSError(f'the server rejected the probe login with {reply.strip()!r}')
+
+    def list_users(self):
+        self.sock.sendall(b'LIST\n')
+
+        while True:
+            reply = self.reader.readline()
+            if not reply:
+                raise OSError('the server closed the probe connection')
+
+            if reply.startswith('LIST-OK'):
+                return [name for name in reply[len('LIST-OK'):].strip().split(',') if name]
+
+    def close(self):
+        # The probe is a logged in user, so it takes a slot on the server. Closing the sending side logs it
+        # out, and the server closes its side once it has removed the user, so the slot is free on return.
+        try:
+            self.sock.shutdown(socket.SHUT_WR)
+            while self.sock.recv(4096):
+                pass
+        except OSError:
+            pass
+        finally:
+            self.reader.close()
+            self.sock.close()
+
+def wait_for_user_removed(address, port, name, timeout=10, interval=0.1):
+    # Only a readiness wait: when the server cannot be observed with LIST, the whole timeout is waited out
+    # instead, and the caller checks the removal in its own way.
+    deadline = time.monotonic() + timeout
+
+    try:
+        probe = ChatProbe(address, port)
+    except OSError:
+        time.sleep(max(deadline - time.monotonic(), 0))
+        return False
+
+    try:
+        return wait_for_condition(lambda: name not in probe.list_users(), max(deadline - time.monotonic(), 0), interval)
+    except OSError:
+        time.sleep(max(deadline - time.monotonic(), 0))
+        return False
+    finally:
+        probe.close()
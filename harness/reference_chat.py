@@ -0,0 +1,301 @@
+import asyncio
+import random
+import re
+import string
+import threading
+import time
+
+# In-process stand-in for ChatServer.jar and EchoBot.jar. It follows the reference
+# implementation closely, including its quirks, so the chat client tests behave the same
+# without starting three JVMs for every test case.
+
+DEFAULT_MAX_CLIENTS = 300
+MAX_NAMES_PER_IP = 5
+HELLO_TIMEOUT = 20
+LINE_LIMIT = 2 ** 24
+
+DELAYBOT_NAME = 'delaybot'
+ECHOBOT_NAME = 'echobot'
+FLOODBOT_NAME = 'floodbot'
+FLOOD_TICK = 0.01
+
+def split_like_java(pattern, text):
+    # String.split drops trailing empty strings
+    parts = re.split(pattern, text)
+    while parts and parts[-1] == '':
+        parts.pop()
+
+    return parts
+
+class ChatClient():
+    def __init__(self, name, writer) -> None:
+        self.name = name
+        self.writer = writer
+        self.ip = writer.get_extra_info('peername')[0]
+
+    def send(self, text):
+        if not self.writer.is_closing():
+            self.writer.write(text.encode('utf-8'))
+
+    def sendln(self, text):
+        self.send(text + '\n')
+
+class ReferenceChatServer():
+    def __init__(self, address='127.0.0.1', port=0, max_clients=DEFAULT_MAX_CLIENTS, client_list_printing=True, delay=True, bots=True) -> None:
+        self.address = address
+        self.port = port
+        self.max_clients = DEFAULT_MAX_CLIENTS if max_clients == -1 else max_clients
+        self.client_list_printing = client_list_printing
+        self.delay = delay
+        self.bots = bots
+
+        self.clients = []
+        self.log = []
+        # (arrival time, client name, line) of every request, so benchmarks can time what the client sends
+        self.requests = []
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = None
+        self._server = None
+        self._writers = set()
+        self._tasks = set()
+
+    def start(self, timeout=5):
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(timeout)
+
+        return self
+
+    def terminate(self, force=False):
+        if self._thread is None:
+            return
+
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+
+    def flood(self, name, count, rate, written, message_size=48):
+        # Sends count DELIVERY lines from a sender that is not logged in to the client called name, at rate
+        # lines per second. The time every line is written is appended to written, so it is still known
+        # when the returned future is cancelled.
+        return asyncio.run_coroutine_threadsafe(self._flood(name, count, rate, written, message_size), self._loop)
+
+    def _print(self, message):
+        self.log.append(message)
+
+    def _spawn(self, coroutine):
+        task = self._loop.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return task
+
+    async def _start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.address, self.port, limit=LINE_LIMIT, reuse_address=True)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._print(f'Now listening on port {self.port}')
+
+        if self.bots:
+            # the harness waits until both bots are logged in or turned away, so tests never race them
+            handshakes = [self._loop.create_future() for _ in range(2)]
+            self._spawn(self._echo_bot(ECHOBOT_NAME, handshakes[0]))
+            self._spawn(self._echo_bot(DELAYBOT_NAME, handshakes[1]))
+            await asyncio.gather(*handshakes)
+
+    async def _stop(self):
+        self._server.close()
+
+        for writer in list(self._writers):
+            writer.close()
+
+        for task in list(self._tasks):
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _client_by_name(self, name):
+        for client in self.clients:
+            if client.name == name:
+                return client
+
+        return None
+
+    def _remove_client(self, client):
+        if client in self.clients:
+            self._print(f'Removing client {client.name}')
+            self.clients.remove(client)
+
+    def _clip_ip(self, ip):
+        for client in [client for client in self.clients if client.ip == ip]:
+            client.writer.close()
+            self.clients.remove(client)
+
+    async def _read_line(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    async def _handle_connection(self, reader, writer):
+        self._writers.add(writer)
+        client = None
+        ip = writer.get_extra_info('peername')[0]
+        self._print(f'Got connection from {ip}')
+
+        try:
+            if len([known for known in self.clients if known.ip == ip]) >= MAX_NAMES_PER_IP:
+                self._print(f'Client {ip} has reached its name limit')
+                self._clip_ip(ip)
+
+            client = await asyncio.wait_for(self._say_hello(reader, writer), HELLO_TIMEOUT)
+            if client is None:
+                self._print(f'Bad HELLO request from {ip}')
+                return
+
+            while True:
+                line = await self._read_line(reader)
+                if line is None:
+                    break
+
+                self._handle_request(client, line)
+                await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            if client is not None:
+                self._remove_client(client)
+
+            self._print(f'Closing connection from {ip}')
+            writer.close()
+            self._writers.discard(writer)
+
+    async def _say_hello(self, reader, writer):
+        line = await self._read_line(reader)
+        if line is None:
+            return None
+
+        if not line.startswith('HELLO-FROM'):
+            writer.write(b'BAD-RQST-HDR\n')
+            return None
+
+        parts = split_like_java('[^a-zA-Z0-9]', line)
+        if len(parts) != 3:
+            writer.write(b'BAD-RQST-BODY\n')
+            return None
+
+        if self._client_by_name(parts[2]) is not None:
+            writer.write(b'IN-USE\n')
+            return None
+
+        client = ChatClient(parts[2], writer)
+        self._print(f'Adding client {client.name} (IP: {client.ip})')
+
+        if len(self.clients) < self.max_clients:
+            self.clients.append(client)
+            client.sendln(f'HELLO {client.name}')
+        else:
+            # like the reference server, a busy client stays connected but never joins the list
+            self._print('Too many clients')
+            client.sendln('BUSY')
+
+        return client
+
+    async def _flood(self, name, count, rate, written, message_size):
+        client = self._client_by_name(name)
+        if client is None:
+            raise ValueError(f'{name} is not logged in')
+
+        padding = ''.join(random.choice(string.ascii_letters) for _ in range(message_size))
+        started = time.monotonic()
+
+        while len(written) < count:
+            due = min(count, int((time.monotonic() - started) * rate) + 1)
+
+            while len(written) < due:
+                client.sendln(f'DELIVERY {FLOODBOT_NAME} {len(written)} {padding}')
+                written.append(time.monotonic())
+
+            # a client that does not read fast enough slows the flood down instead of filling this process
+            await client.writer.drain()
+            await asyncio.sleep(FLOOD_TICK)
+
+    def _handle_request(self, client, line):
+        self.requests.append((time.monotonic(), client.name, line))
+
+        if line == 'LIST':
+            self._print(f'LIST request from {client.name}')
+            self._send_client_list(client)
+        elif line.startswith('SEND'):
+            self._print(f'SEND request from {client.name}')
+            self._handle_send(client, line)
+        else:
+            self._print(f'Bad request header from {client.name}')
+            client.sendln('BAD-RQST-HDR')
+
+    def _send_client_list(self, client):
+        if not self.client_list_printing:
+            client.sendln(f'LIST-OK {ECHOBOT_NAME},{DELAYBOT_NAME}')
+        else:
+            client.sendln('LIST-OK ' + ','.join(known.name for known in self.clients))
+
+    def _handle_send(self, client, line):
+        tokens = line.split(None, 2)
+
+        if len(tokens) < 3 or not tokens[2].strip():
+            client.sendln('BAD-RQST-BODY')
+            return
+
+        destination = self._client_by_name(tokens[1])
+        message = tokens[2].strip()
+
+        if destination is None:
+            client.sendln('BAD-DEST-USER')
+            return
+
+        if not (self.delay and client.name == DELAYBOT_NAME):
+            client.sendln('SEND-OK')
+            destination.sendln(f'DELIVERY {client.name} {message}')
+            return
+
+        # the delaybot reply is cut into three chunks, sent 0, 500 and 1000 ms apart, that spell two deliveries
+        message_halves = (message[:len(message) // 2], message[len(message) // 2:])
+        name_halves = (client.name[:len(client.name) // 2], client.name[len(client.name) // 2:])
+
+        destination.send(f'DELIVERY {client.name} {message_halves[0]}')
+        self._loop.call_later(0, client.send, 'SEND-OK\n')
+        self._loop.call_later(0.5, destination.send, f'{message_halves[1]}\nDELIVERY {name_halves[0]}')
+        self._loop.call_later(1, destination.send, f'{name_halves[1]} {message}\n')
+
+    async def _echo_bot(self, name, handshake):
+        try:
+            reader, writer = await asyncio.open_connection(self.address, self.port, limit=LINE_LIMIT)
+        except OSError:
+            handshake.set_result(False)
+            return
+
+        try:
+            writer.write(f'HELLO-FROM {name}\n'.encode('utf-8'))
+            reply = await self._read_line(reader)
+            handshake.set_result(reply is not None and reply.startswith('HELLO'))
+
+            if not handshake.result():
+                return
+
+            while True:
+                line = await self._read_line(reader)
+                if line is None:
+                    break
+
+                if line.startswith('DELIVERY'):
+                    writer.write((line.replace('DELIVERY', 'SEND ', 1) + '\n').encode('utf-8'))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if not handshake.done():
+                handshake.set_result(False)
+
+            writer.close()
@@ -0,0 +1,167 @@
+import os
+import resource
+import threading
+import time
+
+SAMPLE_INTERVAL = 0.1
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+_monitor = None
+
+def read_process_usage(pid):
+    # returns None once the process is gone or on systems without /proc
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            fields = file.read().rsplit(')', 1)[1].split()
+
+        usage = {
+            'cpu_seconds': (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+            'threads': int(fields[17]),
+            'peak_rss_kb': 0,
+            'rss_kb': 0,
+            'fds': 0,
+        }
+
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    usage['peak_rss_kb'] = int(line.split()[1])
+                elif line.startswith('VmRSS:'):
+                    usage['rss_kb'] = int(line.split()[1])
+
+        usage['fds'] = len(os.listdir(f'/proc/{pid}/fd'))
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return usage
+
+class ResourceMonitor():
+    # Samples every watched process in the background for as long as the test case runs and keeps
+    # the last CPU time and the peak memory, descriptor and thread counts of each one.
+    def __init__(self, interval=SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.pids = []
+        self.usage = {}
+        self.started = time.monotonic()
+        self.finished = None
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+        return self
+
+    def watch(self, pid):
+        with self._lock:
+            self.pids.append(pid)
+
+        self._sample(pid)
+
+    def _sample(self, pid):
+        current = read_process_usage(pid)
+        if current is None:
+            return
+
+        with self._lock:
+            previous = self.usage.get(pid)
+
+            if previous is None:
+                self.usage[pid] = current
+                return
+
+            previous['cpu_seconds'] = max(previous['cpu_seconds'], current['cpu_seconds'])
+            for key in ('peak_rss_kb', 'fds', 'threads'):
+                previous[key] = max(previous[key], current[key])
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                pids = list(self.pids)
+
+            for pid in pids:
+                self._sample(pid)
+
+    def stop(self):
+        with self._lock:
+            pids = list(self.pids)
+
+        for pid in pids:
+            self._sample(pid)
+
+        self._stopped.set()
+        self._thread.join()
+        self.finished = time.monotonic()
+
+    def summary(self):
+        usages = list(self.usage.values())
+        if not usages:
+            return {}
+
+        return {
+            'processes': len(usages),
+            'cpu_seconds': round(sum(usage['cpu_seconds'] for usage in usages), 3),
+            'wall_seconds': round((self.finished or time.monotonic()) - self.started, 3),
+            'peak_rss_kb': max(usage['peak_rss_kb'] for usage in usages),
+            'peak_fds': max(usage['fds'] for usage in usages),
+            'peak_threads': max(usage['threads'] for usage in usages),
+        }
+
+def raise_file_limit():
+    # benchmarks open thousands of sockets, and processes started afterwards inherit the new limit
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        return hard
+    except (ValueError, OSError):
+        return soft
+
+def file_limit():
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+def growth_slope(samples, key):
+    # least squares slope of one value of (seconds, usage) samples, per minute
+    points = [(seconds, usage[key]) for seconds, usage in samples]
+    if len(points) < 2:
+        return 0.0
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+
+    if spread == 0:
+        return 0.0
+
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread * 60
+
+def begin_monitoring():
+    global _monitor
+    _monitor = ResourceMonitor().start()
+
+def end_monitoring():
+    global _monitor
+
+    if _monitor is None:
+        return {}
+
+    _monitor.stop()
+    summary = _monitor.summary()
+    _monitor = None
+
+    return summary
+
+def watch_process(process):
+    # registers a spawned student program; outside of a test case this does nothing
+    if _monitor is not None:
+        _monitor.watch(process.pid)
+
+    return process
+
+def format_usage(usage):
+    if not usage:
+        return 'no resource usage recorded'
+
+    return f'cpu {usage["cpu_seconds"]:.2f}s in {usage["wall_seconds"]:.2f}s, peak rss {usage["peak_rss_kb"] / 1024:.1f} MiB, peak fds {usage["peak_fds"]}, peak threads {usage["peak_threads"]} ({usage["processes"]} processes)'
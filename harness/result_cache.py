@@ -0,0 +1,73 @@
+import glob
+import hashlib
+import json
+import os
+
+from harness.build_cache import cache_directory
+from harness.core import timeout_scale
+from harness.netns import network_isolation_enabled
+from harness.ports import ephemeral_ports_enabled
+
+HARNESS_PATH = os.path.dirname(os.path.abspath(__file__))
+
+def file_digest(*paths):
+    digest = hashlib.sha256()
+
+    for path in paths:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+
+    return digest.hexdigest()
+
+class ResultCache():
+    # Remembers which cases passed for a student file, a version of the tests and the grading options.
+    # Only passes are stored, so failed cases and cases whose student file, check.py, harness or options
+    # changed run again. Suites pass their own options that change results in options.
+    def __init__(self, student_file_path, suite_file_path, cache_path=None, options=None) -> None:
+        suite_name = os.path.basename(os.path.dirname(os.path.abspath(suite_file_path)))
+        self.cache_path = cache_path or os.path.join(cache_directory(), 'results', f'{suite_name}.json')
+
+        try:
+            self.student_digest = file_digest(student_file_path)
+        except OSError:
+            self.student_digest = None
+
+        # a case that passed with a larger timeout scale or against another server may fail without it
+        settings = dict(options or {}, timeout_scale=timeout_scale(), ephemeral_ports=ephemeral_ports_enabled(), network_isolation=network_isolation_enabled())
+        code_digest = file_digest(suite_file_path, *sorted(glob.glob(os.path.join(HARNESS_PATH, '*.py'))))
+        self.suite_digest = hashlib.sha256(f'{code_digest}:{json.dumps(settings, sort_keys=True)}'.encode()).hexdigest()
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def key(self, test_id):
+        return f'{self.suite_digest}:{self.student_digest}:{test_id}'
+
+    def passed(self, test_case):
+        return self.student_digest is not None and self.key(test_case.test_id) in self.entries
+
+    def store(self, result):
+        if self.student_digest is None:
+            return
+
+        if result.success:
+            self.entries[self.key(result.test_id)] = {'test_msg': result.test_msg}
+        else:
+            self.entries.pop(self.key(result.test_id), None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        partial_path = f'{self.cache_path}.{os.getpid()}.partial'
+
+        # passes recorded with an older version of the tests can never be used again
+        current = {key: entry for key, entry in self.entries.items() if key.startswith(f'{self.suite_digest}:')}
+
+        with open(partial_path, 'w') as file:
+            json.dump(current, file)
+
+        os.replace(partial_path, self.cache_path)
@@ -0,0 +1,177 @@
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+
+from harness.core import timeout_scale
+from harness.netns import enter_network_namespace, network_isolation_enabled
+from harness.testcase import print_result
+from harness.timing import write_timing_report
+
+# Worker processes are forked from the suite, so they look the cases up by index
+# instead of receiving pickled copies of them.
+_scheduled_cases = []
+
+def build_argument_parser(network_isolation=True):
+    parser = argparse.ArgumentParser(description='Process test arguments')
+
+    parser.add_argument('--case', type=str, help='Test case name', default=None)
+    parser.add_argument('--tags', type=str, help='List of tags', default=None)
+    parser.add_argument('--disablecolors', type=str, help='(optional) disable colors for the codegrade', default=False)
+    parser.add_argument('--workers', type=int, help='(optional) number of test cases executed at the same time', default=1)
+    parser.add_argument('--timeoutscale', type=float, help='(optional) multiply every expectation timeout by this factor on slow or fast machines', default=timeout_scale())
+    parser.add_argument('--incremental', action='store_true', help='(optional) only run the test cases that did not pass with the current version of your file')
+    parser.add_argument('--resources', action='store_true', help='(optional) print the CPU time, memory, descriptors and threads used by your program in every test case')
+    parser.add_argument('--timingreport', type=str, help='(optional) write the duration of every test step to this JSON or CSV file', default=None)
+
+    if network_isolation:
+        parser.add_argument('--isolate', action='store_true', help='(optional) execute every test case in its own network namespace (Linux only, needs CAP_SYS_ADMIN or user namespaces)')
+
+    return parser
+
+def parse_tags(tags):
+    if not tags:
+        return None
+
+    try:
+        # Assuming the tags are passed in a format that's convertible to a Python list
+        return json.loads(tags.replace("'", "\""))
+    except json.JSONDecodeError as e:
+        print(f"Error parsing tags: {e}")
+        return None
+
+def select_test_cases(test_cases, case, tags_list):
+    if case is not None:
+        return [test for test in test_cases if test.test_id == case][:1]
+
+    if tags_list is not None:
+        return [test for test in test_cases if len([tag for tag in test.tags if tag in tags_list]) > 0]
+
+    return list(test_cases)
+
+def _run_scheduled_case(index):
+    # forked workers start with the parent's random state, which would give every worker the same names
+    random.seed()
+
+    if network_isolation_enabled() and _scheduled_cases[index].isolatable:
+        enter_network_namespace()
+
+    return _scheduled_cases[index].run()
+
+def _prerequisites(cases):
+    # only earlier cases count as prerequisites, so the order of the test list is always a valid schedule
+    positions = {}
+    prerequisites = []
+
+    for index, case in enumerate(cases):
+        prerequisites.append([positions[key] for key in case.requires if key in positions])
+        positions[case.key] = index
+
+    return prerequisites
+
+def _skip_reason(failed_results):
+    failed = ', '.join(result.test_id for result in failed_results)
+
+    return f'the prerequisite {failed} did not pass'
+
+def run_test_cases(test_cases, workers=1):
+    global _scheduled_cases
+
+    isolated = network_isolation_enabled()
+    cases = list(test_cases)
+    prerequisites = _prerequisites(cases)
+    results = [None] * len(cases)
+
+    # the static stage only reads the student file, so it runs before any server or client is spawned
+    static_stage = [index for index, test in enumerate(cases) if test.static and not prerequisites[index]]
+
+    if workers <= 1 and not isolated:
+        for index in static_stage:
+            results[index] = cases[index].run()
+
+        for index, test in enumerate(cases):
+            if results[index] is None:
+                failed = [results[position] for position in prerequisites[index] if not results[position].success]
+                results[index] = test.skip(_skip_reason(failed)) if failed else test.run()
+            yield results[index]
+        return
+
+    _scheduled_cases = cases
+    context = multiprocessing.get_context('fork')
+    finished = queue.Queue()
+    dependents = [[] for _ in cases]
+    remaining = [len(positions) for positions in prerequisites]
+    next_result = 0
+
+    for index, positions in enumerate(prerequisites):
+        for position in positions:
+            dependents[position].append(index)
+
+    # an isolated case gets a fresh worker process, and with it a fresh namespace where no port is taken
+    max_tasks = 1 if isolated else None
+
+    with context.Pool(max(workers, 1), maxtasksperchild=max_tasks) as pool, context.Pool(1, maxtasksperchild=max_tasks) as exclusive_lane:
+        def start(index):
+            # a case that cannot be isolated shares the network of the machine, so its ports are not free
+            lane = exclusive_lane if cases[index].exclusive and not (isolated and cases[index].isolatable) else pool
+            lane.apply_async(_run_scheduled_case, (index,), callback=lambda result: finished.put((index, result)), error_callback=lambda error: finished.put((index, error)))
+
+        def finish(index, result):
+            # a case starts once all its prerequisites passed and is skipped as soon as one of them did not
+            results[index] = result
+
+            for dependent in dependents[index]:
+                if results[dependent] is not None:
+                    continue
+
+                if not result.success:
+                    finish(dependent, cases[dependent].skip(_skip_reason([result])))
+                else:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        start(dependent)
+
+        for index in static_stage + [index for index in range(len(cases)) if not cases[index].static or prerequisites[index]]:
+            if remaining[index] == 0:
+                start(index)
+
+        # results are yielded in the order of the test list, so the output matches a serial run
+        while next_result < len(cases):
+            while next_result < len(cases) and results[next_result] is not None:
+                yield results[next_result]
+                next_result += 1
+
+            if next_result < len(cases):
+                index, result = finished.get()
+
+                if isinstance(result, BaseException):
+                    raise result
+
+                finish(index, result)
+
+def execute_tests(test_cases, case, tags_list, disable_colors=False, workers=1, timing_report=None, show_resources=False, result_cache=None):
+    success = True
+    results = []
+    selected = select_test_cases(test_cases, case, tags_list)
+    cached = [result_cache is not None and result_cache.passed(test) for test in selected]
+    fresh_results = run_test_cases([test for test, passed in zip(selected, cached) if not passed], workers)
+
+    for test, passed in zip(selected, cached):
+        result = test.cached_pass() if passed else next(fresh_results)
+        print_result(result, disable_colors, show_resources)
+        results.append(result)
+
+        if result_cache is not None and not passed:
+            result_cache.store(result)
+
+        if not result.success:
+            success = False
+
+    if result_cache is not None:
+        result_cache.save()
+
+    if timing_report:
+        write_timing_report([(result.test_id, result) for result in results], timing_report)
+
+    return success
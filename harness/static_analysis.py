@@ -0,0 +1,157 @@
+import ast
+import json
+import os
+
+from harness.build_cache import cache_directory
+from harness.core import TestException
+from harness.result_cache import file_digest
+from harness.testcase import TestCase, add_note
+
+SENDALL = 'sendall'
+SLEEP_IN_RECEIVE_LOOP = 'sleep-in-receive-loop'
+UNBOUNDED_RECEIVE_LOOP = 'unbounded-receive-loop'
+
+RECEIVE_METHODS = {'recv', 'recvfrom', 'recv_into', 'recvfrom_into', 'recvmsg'}
+EXIT_FUNCTIONS = {'exit', '_exit', 'quit'}
+# a loop that waits for new connections or readable sockets is the main loop of a server, which is meant to run forever
+SERVER_LOOP_METHODS = {'select', 'poll', 'epoll', 'accept', 'kqueue'}
+
+def _call_name(call):
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+
+    return None
+
+def _walk_body(nodes, into_loops=True):
+    # nested functions and classes run at another time, so they do not belong to the loop around them
+    for node in nodes:
+        yield node
+
+        if not into_loops and isinstance(node, (ast.While, ast.For, ast.AsyncFor)):
+            continue
+
+        for child in ast.iter_child_nodes(node):
+            if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+                yield from _walk_body([child], into_loops)
+
+def _is_endless(loop):
+    return isinstance(loop, ast.While) and isinstance(loop.test, ast.Constant) and bool(loop.test.value)
+
+def _leaves_loop(loop):
+    for node in _walk_body(loop.body):
+        if isinstance(node, (ast.Return, ast.Raise)):
+            return True
+
+        if isinstance(node, ast.Call) and _call_name(node) in EXIT_FUNCTIONS:
+            return True
+
+    # a break only ends the innermost loop it is in
+    return any(isinstance(node, ast.Break) for node in _walk_body(loop.body, into_loops=False))
+
+def _receives(node):
+    return any(isinstance(call, ast.Call) and _call_name(call) in RECEIVE_METHODS for call in ast.walk(node))
+
+def _tests_received_data(loop):
+    # recv() returns nothing once the other side closed the connection, so testing its result is how a loop notices
+    received = set()
+
+    for node in _walk_body(loop.body):
+        if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.NamedExpr)) and node.value is not None and _receives(node.value):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            received |= {name.id for target in targets for name in ast.walk(target) if isinstance(name, ast.Name)}
+
+    for node in _walk_body(loop.body):
+        if not isinstance(node, (ast.If, ast.While, ast.IfExp, ast.Assert)):
+            continue
+
+        if _receives(node.test) or any(isinstance(name, ast.Name) and name.id in received for name in ast.walk(node.test)):
+            return True
+
+    return False
+
+def _serves_connections(loop):
+    return any(isinstance(call, ast.Call) and _call_name(call) in SERVER_LOOP_METHODS for call in _walk_body(loop.body))
+
+def analyze_source(source):
+    tree = ast.parse(source)
+    findings = []
+    reported = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr == 'sendall' or isinstance(node, ast.Name) and node.id == 'sendall':
+            findings.append({'kind': SENDALL, 'line': node.lineno, 'message': 'sendall() is used'})
+
+        if isinstance(node, ast.Call) and _call_name(node) == 'getattr' and any(isinstance(arg, ast.Constant) and arg.value == 'sendall' for arg in node.args):
+            findings.append({'kind': SENDALL, 'line': node.lineno, 'message': 'sendall() is looked up with getattr'})
+
+        if not isinstance(node, (ast.While, ast.For, ast.AsyncFor)):
+            continue
+
+        calls = [call for call in _walk_body(node.body) if isinstance(call, ast.Call)]
+        if not any(_call_name(call) in RECEIVE_METHODS for call in calls):
+            continue
+
+        for call in calls:
+            if _call_name(call) == 'sleep' and (SLEEP_IN_RECEIVE_LOOP, call.lineno) not in reported:
+                reported.add((SLEEP_IN_RECEIVE_LOOP, call.lineno))
+                findings.append({'kind': SLEEP_IN_RECEIVE_LOOP, 'line': call.lineno, 'message': f'sleep() in the receive loop that starts on line {node.lineno} delays every message'})
+
+        if _is_endless(node) and not _leaves_loop(node) and not _serves_connections(node) and not _tests_received_data(node):
+            findings.append({'kind': UNBOUNDED_RECEIVE_LOOP, 'line': node.lineno, 'message': 'this receive loop never ends, so it spins forever once the other side closes the connection and recv() keeps returning nothing'})
+
+    return sorted(findings, key=lambda finding: (finding['line'], finding['kind']))
+
+def analyze_file(file_path, cache_dir=None):
+    # the results only depend on the file and on this analyzer, so they are cached by both hashes
+    cache_dir = os.path.join(cache_dir or cache_directory(), 'static')
+    cache_path = os.path.join(cache_dir, f'{file_digest(file_path, os.path.abspath(__file__))}.json')
+
+    try:
+        with open(cache_path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        pass
+
+    with open(file_path, 'r') as file:
+        findings = analyze_source(file.read())
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path, 'w') as file:
+        json.dump(findings, file)
+
+    return findings
+
+def check_student_file(file_path, forbidden=[SENDALL]):
+    # forbidden findings fail the case, the others are reported as notes next to the result
+    try:
+        findings = analyze_file(file_path)
+    except FileNotFoundError:
+        raise TestException(f'File {os.path.basename(file_path)} was not found. Please ensure that your implementation is located in the same folder under {os.path.basename(file_path)} name')
+    except SyntaxError as e:
+        raise TestException(f'{os.path.basename(file_path)} could not be parsed: {e}')
+
+    failures = [finding for finding in findings if finding['kind'] in forbidden]
+
+    for finding in findings:
+        if finding['kind'] not in forbidden:
+            add_note(f'line {finding["line"]}: {finding["message"]}')
+
+    if failures:
+        raise TestException('\n'.join(f'line {finding["line"]}: {finding["message"]}' for finding in failures))
+
+    return findings
+
+class StaticTestCase(TestCase):
+    # Only reads the student file, so it never starts a server and can run next to anything.
+    # Its check function should call check_student_file.
+    exclusive = False
+    static = True
+
+    def start_environment(self):
+        return []
+
+    def stop_environment(self, processes):
+        pass
@@ -0,0 +1,144 @@
+import inspect
+
+from harness.capture import begin_case
+from harness.chat_protocol import run_sessions
+from harness.resources import begin_monitoring, end_monitoring, format_usage
+from harness.timing import begin_timing, collected_steps
+
+_notes = []
+_metrics = {}
+
+def add_note(note):
+    # remarks that do not decide the outcome of a case but are printed next to its result
+    _notes.append(note)
+
+def add_metrics(**values):
+    # measurements of benchmark cases, printed next to the result and written to the timing report
+    _metrics.update(values)
+
+def format_metrics(metrics):
+    return ', '.join(f'{key} {value}' for key, value in metrics.items() if not isinstance(value, (list, dict)))
+
+class TestResult():
+    def __init__(self, test_case, success, error_message='', skipped=False, cached=False) -> None:
+        self.test_id = test_case.test_id
+        self.test_msg = test_case.test_msg
+        self.tags = test_case.tags
+        self.success = success
+        self.error_message = error_message
+        self.skipped = skipped
+        self.cached = cached
+        self.timings = []
+        self.resources = {}
+        self.notes = []
+        self.metrics = {}
+
+def print_result(result, disable_colors=False, show_resources=False):
+    tags_string = ' '.join(result.tags)
+
+    if result.skipped:
+        if not disable_colors:
+            print(f'\033[93m[ - ] \033[30m{result.test_id}. {result.test_msg} \033[93mSkipped! \033[30m {result.error_message} \033[0m')
+        else:
+            print(f'[ - ] {result.test_id}. {result.test_msg} Skipped! {result.error_message}')
+    elif result.cached:
+        if not disable_colors:
+            print(f'\033[92m[ \u2713 ] \033[30m{result.test_id}. {result.test_msg}. \033[92mSuccess! \033[30m(cached, the file did not change since it passed) \033[0m')
+        else:
+            print(f'[ \u2713 ] {result.test_id}. {result.test_msg}. Success! (cached, the file did not change since it passed)')
+    elif result.success:
+        if not disable_colors:
+            print(f'\033[92m[ \u2713 ] \033[30m{result.test_id}. {result.test_msg}. \033[92mSuccess! \033[0m')
+        else:
+            print(f'[ \u2713 ] {result.test_id}. {result.test_msg}. Success!')
+    else:
+        if not disable_colors:
+            print(f'\033[91m[ x ] \033[30m{result.test_id}. {result.test_msg} \033[91mFailed! \033[30m The list of tags is {tags_string} \nError message is {result.error_message} \033[0m')
+        else:
+            print(f'[ x ] {result.test_id}. {result.test_msg} Failed! The list of tags is {tags_string} \nError message is {result.error_message}')
+
+    if show_resources and not result.skipped and not result.cached:
+        print(f'      {format_usage(result.resources)}')
+
+    if result.metrics:
+        print(f'      {format_metrics(result.metrics)}')
+
+    for note in result.notes:
+        print(f'      note: {note}')
+
+class TestCase():
+    # Cases that bind fixed ports cannot run next to each other, so the scheduler
+    # runs every exclusive case one after another in a single lane.
+    exclusive = True
+    # static cases only read the student file and run before anything else is started
+    static = False
+    # cases that need the network outside of the machine cannot run in an isolated namespace
+    isolatable = True
+
+    def __init__(self, test_func, test_id, test_msg, tags=[], requires=[]) -> None:
+        self.tags = tags
+        self.test_func = test_func
+        self.test_id = test_id
+        self.test_msg = test_msg
+        self.requires = requires
+
+    @property
+    def key(self):
+        return self.test_id
+
+    def skip(self, reason):
+        return TestResult(self, False, reason, skipped=True)
+
+    def cached_pass(self):
+        return TestResult(self, True, cached=True)
+
+    def start_environment(self):
+        return []
+
+    def stop_environment(self, processes):
+        for process in processes:
+            process.terminate(force=True)
+
+    def describe_startup_failure(self, error):
+        return f'{error}'
+
+    def describe_failure(self, error, processes):
+        return f'{error}'
+
+    def run(self, log_name=None):
+        begin_case(log_name or self.test_id)
+        begin_timing()
+        begin_monitoring()
+        _notes.clear()
+        _metrics.clear()
+
+        try:
+            processes = self.start_environment()
+        except Exception as e:
+            end_monitoring()
+            return TestResult(self, False, self.describe_startup_failure(e))
+
+        try:
+            outcome = self.test_func()
+
+            # test functions that drive chat sessions are coroutines and get their own event loop
+            if inspect.iscoroutine(outcome):
+                run_sessions(outcome)
+
+            result = TestResult(self, True)
+        except Exception as e:
+            result = TestResult(self, False, self.describe_failure(e, processes))
+
+        result.resources = end_monitoring()
+        self.stop_environment(processes)
+        result.timings = collected_steps()
+        result.notes = list(_notes)
+        result.metrics = dict(_metrics)
+
+        return result
+
+    def execute(self, disable_colors=False, show_resources=False):
+        result = self.run()
+        print_result(result, disable_colors, show_resources)
+
+        return result.success
@@ -0,0 +1,86 @@
+import csv
+import json
+import re
+import time
+
+WORD = re.compile(r'[A-Za-z]+')
+
+# benchmarks go through far more steps than the tests, only the first ones of a case are kept
+MAX_RECORDED_STEPS = 10000
+
+_steps = []
+# generated user names differ on every run, so they are masked when steps are grouped. Only the names
+# generate_name() handed out are masked, ordinary words like Delaybot are kept.
+_generated_names = set()
+
+def begin_timing():
+    _steps.clear()
+
+def register_generated_name(name):
+    _generated_names.add(name)
+
+def record_step(step, started, outcome):
+    # the key is made here, because the names are generated in the worker that runs the case
+    if len(_steps) < MAX_RECORDED_STEPS:
+        _steps.append({'step': step, 'key': step_key(step), 'seconds': time.monotonic() - started, 'outcome': outcome})
+
+def collected_steps():
+    return list(_steps)
+
+def step_key(step):
+    return WORD.sub(lambda match: '<name>' if match.group() in _generated_names else match.group(), step)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(durations):
+    return {
+        'count': len(durations),
+        'p50': percentile(durations, 0.5),
+        'p95': percentile(durations, 0.95),
+        'max': max(durations),
+    }
+
+def build_timing_report(named_results):
+    cases = {}
+    steps = {}
+
+    for name, result in named_results:
+        if not result.timings and not result.resources and not result.metrics:
+            continue
+
+        durations = [timing['seconds'] for timing in result.timings]
+        cases[name] = dict(summarize(durations) if durations else {'count': 0}, steps=result.timings, resources=result.resources)
+
+        if result.metrics:
+            cases[name]['metrics'] = result.metrics
+
+        for timing in result.timings:
+            steps.setdefault(timing.get('key', timing['step']), []).append(timing['seconds'])
+
+    return {'cases': cases, 'steps': {step: summarize(durations) for step, durations in steps.items()}}
+
+def write_timing_report(named_results, output_path):
+    report = build_timing_report(named_results)
+
+    if not output_path.endswith('.csv'):
+        with open(output_path, 'w') as file:
+            json.dump(report, file, indent=2)
+        return
+
+    resource_keys = ['cpu_seconds', 'wall_seconds', 'peak_rss_kb', 'peak_fds', 'peak_threads']
+
+    with open(output_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['scope', 'name', 'count', 'p50', 'p95', 'max'] + resource_keys)
+
+        for scope, entries in (('case', report['cases']), ('step', report['steps'])):
+            for name, summary in entries.items():
+                durations = [f'{summary[key]:.4f}' if key in summary else '' for key in ('p50', 'p95', 'max')]
+                resources = summary.get('resources', {})
+                writer.writerow([scope, name, summary['count']] + durations + [resources.get(key, '') for key in resource_keys])
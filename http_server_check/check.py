@@ -1,70 +1,27 @@
-import pexpect
 import http.client
-import argparse
-import json
+import os
+import sys
 import random
 import string
 import socket
 import requests
 import re
-from pexpect.exceptions import TIMEOUT as TimeoutException, EOF as EndOfFileException
+from pexpect.exceptions import TIMEOUT as TimeoutException
 from bs4 import BeautifulSoup
 
-SERVER_ADDRESS = "127.0.0.1"
-SERVER_PORT = 8000
-STUDENT_FILE_PATH = "../student/http_server_check/server.py"
-
-def generate_name():
-    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(8, 16)))
-
-def generate_message(min_len=32, max_len=64):
-    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(min_len, max_len)))
-
-class TestException(Exception):
-    pass
-
-def get_last_printed_line(output_buffer):
-    last_printed_line = '[EMPTY LINE. PROGRAM DID NOT PRODUCE ANY OUTPUT]  - the client did not produce any output which means it could not connect to the server. Please check you are starting your server at a correct address \'127.0.0.1\' and port 8000 and that your server uses reuse option BEFORE binding to the port'
-    lines = output_buffer.split('\n')
-
-    for line in reversed(lines):
-        if line.strip():
-            last_printed_line = line
-            break
-
-    return last_printed_line
-
-def handle_pexpect(child_process, processes_to_terminate, expect_string, output_buffer, step, timeout=1, display_expect_string=''):
-    try:
-        child_process.expect(expect_string, timeout=timeout)
-        output_buffer += child_process.before + child_process.after
-
-    except TimeoutException:
-        output_buffer += child_process.before
-        last_printed_line = get_last_printed_line(output_buffer)
-
-        for process in processes_to_terminate:
-            process.terminate(force=True)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-        if display_expect_string:
-            expect_string = display_expect_string
+import harness
+from harness import TestException, execute_and_detach
 
-        raise TestException(f'unexpected output at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    except EndOfFileException:
-        if type(child_process.before) == 'str':
-            output_buffer += child_process.before
-        
-        if type(child_process.after) == 'str':
-            output_buffer += child_process.after
-        
-        last_printed_line = get_last_printed_line(output_buffer)
+SERVER_ADDRESS = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8000
+SERVER_PORT = DEFAULT_SERVER_PORT
+STUDENT_FILE_PATH = "../student/http_server_check/server.py"
 
-        for process in processes_to_terminate:
-            process.terminate(force=True)
-            
-        raise TestException(f'program has unexpectidly terminated at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    
-    return output_buffer
+def empty_output_message():
+    # the port differs per test case with --ephemeralports, so the hint is built when the server starts
+    return f'[EMPTY LINE. PROGRAM DID NOT PRODUCE ANY OUTPUT] - the server did not produce any output. Please check you are starting your server at a correct address \'{SERVER_ADDRESS}\' and port {SERVER_PORT} and that your server uses reuse option BEFORE binding to the port'
 
 def handle_httpconnection_request(page_path, method="GET", timeout=3):
     try:
@@ -90,14 +47,14 @@ def handle_requests_request(page_path, data):
         raise TestException(f'error when requesting {page_path} with method POST: {e}')
 
 def start_server():
-    server_process = execute_and_detach(f'python3 {STUDENT_FILE_PATH} --address {SERVER_ADDRESS} --port {SERVER_PORT}')
+    server_process = harness.watch_process(execute_and_detach(f'python3 {STUDENT_FILE_PATH} --address {SERVER_ADDRESS} --port {SERVER_PORT}'))
     EXPECTED_OUTPUT = f'Serving HTTP on port {SERVER_PORT}'
 
-    output_buffer = handle_pexpect(server_process, [server_process], EXPECTED_OUTPUT, "", "starting a server")
+    output_buffer = harness.handle_pexpect(server_process, [server_process], EXPECTED_OUTPUT, "", "starting a server", empty_output_message=empty_output_message())
+    harness.wait_for_tcp(SERVER_ADDRESS, SERVER_PORT, timeout=5)
         
     return server_process, output_buffer
 
-
 def index_reachable():
     __, _ = start_server()
     PAGE_PATH = "/"
@@ -149,7 +106,6 @@ def check_content_length():
     if content_length != actual_content_length:
         raise TestException(f'the content length specified {content_length} is not the actual content length {actual_content_length}')
 
-
 def load_index_page_cat_images():
     __, _ = start_server()
     PAGE_PATH_1 = "/img/gleb_cat.jpeg"
@@ -305,115 +261,49 @@ def check_400_is_visible():
     if element is None:
         raise TestException("could not find a test hook on form 400 status code response page. Please check that the page is unmodified and visible")
 
-def execute_and_wait(cmd):
-    process = pexpect.spawn('/bin/sh', ['-c', cmd], encoding='utf-8')
-    process.expect(pexpect.EOF)
-    process.wait()
-
-    return process.exitstatus
-
-def execute_and_collect_output(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    while True:
-        try:
-            line = child.readline()
-            if not line:
-                break
-            yield line
-        except pexpect.EOF:
-            break
-
-def execute_and_detach(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    return child
-
-class TestCase():
-    def __init__(self, test_func, test_id, test_msg, tags=[]) -> None:
-        self.tags = tags
-        self.test_func = test_func
-        self.test_id = test_id
-        self.test_msg = test_msg
-    
-    def execute(self, disable_colors=False):
-        success = True
-        tags_string = ' '.join(self.tags)
-
-        try:
-            self.test_func()
-            
-            if not disable_colors:
-                print(f'\033[92m[ \u2713 ] \033[30m{self.test_id}. {self.test_msg}. \033[92mSuccess! \033[0m')
-            else:
-                print(f'[ \u2713 ] {self.test_id}. {self.test_msg}. Success! ')
-        
-        except Exception as e:
-            success = False
-
-            if not disable_colors:
-                print(f'\033[91m[ x ] \033[30m{self.test_id}. {self.test_msg} \033[91mFailed! \033[30m The list of tags is {tags_string} \nError message is {e} \033[0m')
-            else:
-                print(f'[ x ] {self.test_id}. {self.test_msg} Failed! The list of tags is {tags_string} \nError message is {e}')
+class TestCase(harness.TestCase):
+    @property
+    def exclusive(self):
+        return not harness.ephemeral_ports_enabled()
 
+    def start_environment(self):
+        global SERVER_PORT
+        SERVER_PORT = harness.allocate_port(DEFAULT_SERVER_PORT, SERVER_ADDRESS)
 
-        return success
+        return []
 
 test_cases = [
     TestCase(start_server, "http_server_001", "Start server and expect start up message", ['ISR1', 'ISR2']),
-    TestCase(index_reachable, "http_server_002", "Request index page and expect 200 status code", ['PR1', 'PR2', 'RR1', 'RR4']),
-    TestCase(check_encoding, "http_server_003", "Request a page and expect encoding utf-8", ['RR5']),
-    TestCase(check_content_length, "http_server_004", "Request a page and expect appropiate content length", ['RR3']), 
-    TestCase(not_found_page_reachable, "http_server_005", "Request non-existent page and expect 404 status code", ['RR7']),
-    TestCase(load_index_page_cat_images, "http_server_006", "Request templated images and expect 200 status code", ['LR5']),
-    TestCase(send_data, "http_server_007", "Submit form data to /data endpoint and expect 201 status code", ['LR7']),
-    TestCase(send_data_and_check_is_visible, "http_server_008", "Submit form data to /data endpoint and expect form results appear on /personal_cats.html page", ['LR6', 'LR7']),
-    TestCase(test_persistent_connection, "http_server_009", "Submit two requests using one connection and expect both success (testing server persistent connection support)", ['PR4']),
-    TestCase(check_index_is_visible, "http_server_010", "Request index.html and expect to be visible", ['LR3']),
-    TestCase(check_post_form_submission_is_visible, "http_server_011", "Submit form data to /data endpoint and expect page communication successull form submission visible", ['RR6']),
-    TestCase(check_404_is_visible, "http_server_012", "Request non-existing page and expect 404 page to be visible", ['RR7']),
-    TestCase(check_form_emtpy_field_validation, "http_server_013", "Submit empty form data to /data endpoint and expect 400 status code", ['RR8']),
-    TestCase(check_400_is_visible, "http_server_014", "Submit empty form data to /data endpoint and expect 400 error page visible", ['RR8'])
+    TestCase(index_reachable, "http_server_002", "Request index page and expect 200 status code", ['PR1', 'PR2', 'RR1', 'RR4'], requires=['http_server_001']),
+    TestCase(check_encoding, "http_server_003", "Request a page and expect encoding utf-8", ['RR5'], requires=['http_server_001']),
+    TestCase(check_content_length, "http_server_004", "Request a page and expect appropiate content length", ['RR3'], requires=['http_server_001']), 
+    TestCase(not_found_page_reachable, "http_server_005", "Request non-existent page and expect 404 status code", ['RR7'], requires=['http_server_001']),
+    TestCase(load_index_page_cat_images, "http_server_006", "Request templated images and expect 200 status code", ['LR5'], requires=['http_server_001']),
+    TestCase(send_data, "http_server_007", "Submit form data to /data endpoint and expect 201 status code", ['LR7'], requires=['http_server_001']),
+    TestCase(send_data_and_check_is_visible, "http_server_008", "Submit form data to /data endpoint and expect form results appear on /personal_cats.html page", ['LR6', 'LR7'], requires=['http_server_001']),
+    TestCase(test_persistent_connection, "http_server_009", "Submit two requests using one connection and expect both success (testing server persistent connection support)", ['PR4'], requires=['http_server_001']),
+    TestCase(check_index_is_visible, "http_server_010", "Request index.html and expect to be visible", ['LR3'], requires=['http_server_001']),
+    TestCase(check_post_form_submission_is_visible, "http_server_011", "Submit form data to /data endpoint and expect page communication successull form submission visible", ['RR6'], requires=['http_server_001']),
+    TestCase(check_404_is_visible, "http_server_012", "Request non-existing page and expect 404 page to be visible", ['RR7'], requires=['http_server_001']),
+    TestCase(check_form_emtpy_field_validation, "http_server_013", "Submit empty form data to /data endpoint and expect 400 status code", ['RR8'], requires=['http_server_001']),
+    TestCase(check_400_is_visible, "http_server_014", "Submit empty form data to /data endpoint and expect 400 error page visible", ['RR8'], requires=['http_server_001'])
 ]
 
-parser = argparse.ArgumentParser(description='Process test arguments')
+def main():
+    parser = harness.build_argument_parser()
+    parser.add_argument('--ephemeralports', action='store_true', help='(optional) give every test case its own free port. Your server must use the --address and --port arguments')
+    args = parser.parse_args()
 
-parser.add_argument('--case', type=str, help='Test case name', default=None)
-parser.add_argument('--tags', type=str, help='List of tags', default=None)
-parser.add_argument('--disablecolors', type=str, help='(optional) disable colors for the codegrade', default=False)
-args = parser.parse_args()
+    harness.set_timeout_scale(args.timeoutscale)
+    harness.enable_network_isolation(args.isolate)
+    harness.enable_ephemeral_ports(args.ephemeralports)
 
-case = args.case
-disable_colors = args.disablecolors
-
-if args.tags:
-    try:
-        # Assuming the tags are passed in a format that's convertible to a Python list
-        tags_list = json.loads(args.tags.replace("'", "\""))
-    except json.JSONDecodeError as e:
-        print(f"Error parsing tags: {e}")
-        tags_list = None
-else:
-    tags_list = None
-
-def execute_tests(test_cases, case, tags_list, disable_colors):
-    success = True
-    for test in test_cases:
-        if tags_list is not None and len([tag for tag in test.tags if tag in tags_list]) > 0 and case is None:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-        elif case is not None and case == test.test_id:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-            break
-        elif case is None and tags_list is None:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-        else:
-            continue
-    
-    return success
+    result_cache = harness.ResultCache(STUDENT_FILE_PATH, __file__) if args.incremental else None
 
+    if not harness.execute_tests(test_cases, args.case, harness.parse_tags(args.tags), args.disablecolors, args.workers, args.timingreport, args.resources, result_cache):
+        exit(1)
+    else:
+        exit(0)
 
-if not execute_tests(test_cases=test_cases, case=case, tags_list=tags_list, disable_colors=disable_colors):
-    exit(1)
-else:
-    exit(0)
+if __name__ == '__main__':
+    main()
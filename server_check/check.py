@@ -1,454 +1,349 @@
+import asyncio
 import pexpect
 import os
-import argparse
-import json
-import random
-import string
-from pexpect.exceptions import TIMEOUT as TimeoutException, EOF as EndOfFileException
-import time
-
-CLIENT_FOLDER_PATH = './'
-ADDRESS = "127.0.0.1"
-PORT = 5378
-STUDENT_FILE_PATH = "../student/server_check/server.py"
-
-def generate_name():
-    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(8, 16)))
-
-def generate_message(min_len=32, max_len=64):
-    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(min_len, max_len)))
-
-class TestException(Exception):
-    pass
+import sys
+import functools
 
-def get_last_printed_line(output_buffer):
-    last_printed_line = '[EMPTY LINE. PROGRAM DID NOT PRODUCE ANY OUTPUT] - the client did not produce any output which means it could not connect to the server. Please check you are starting your server at a correct address \'127.0.0.1\' and port 5378 and that your server uses reuse option BEFORE binding to the port'
-    lines = output_buffer.split('\n')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-    for line in reversed(lines):
-        if line.strip():
-            last_printed_line = line
-            break
+import harness
+from harness import TestException, execute_and_detach, generate_message, generate_name
 
-    return last_printed_line
-
-def handle_pexpect(child_process, processes_to_terminate, expect_string, output_buffer, step, timeout=1, display_expect_string=''):
-    try:
-        child_process.expect(expect_string, timeout=timeout)
-        output_buffer += child_process.before + child_process.after
-
-    except TimeoutException:
-        output_buffer += child_process.before
-        last_printed_line = get_last_printed_line(output_buffer)
+ADDRESS = "127.0.0.1"
+PORT = 5378  # the server stub the students start from binds this port
+STUDENT_FILE_PATH = "../student/server_check/server.py"
 
-        for process in processes_to_terminate:
-            process.terminate(force=True)
+EMPTY_OUTPUT_MESSAGE = '[EMPTY LINE. PROGRAM DID NOT PRODUCE ANY OUTPUT] - the server did not produce any output. Please check you are starting your server at a correct address \'127.0.0.1\' and port 5378 and that your server uses reuse option BEFORE binding to the port'
 
-        if display_expect_string:
-            expect_string = display_expect_string
+# set from the command line in the benchmark mode
+LOAD_SETTINGS = {'session_count': 16, 'rate': 200, 'duration': 10, 'pattern': 'all-to-all', 'message_size': 64}
+CHURN_SETTINGS = {'clients': 8, 'cycles': 25}
+SOAK_SETTINGS = {'duration': 60, 'operations': 100000}
+IDLE_SETTINGS = {'idle_connections': 10000}
+USER_TABLE_SETTINGS = {'size': 5000}
+MESSAGE_SIZE_SETTINGS = {'largest': 2 ** 22}
 
-        raise TestException(f'unexpected output at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    except EndOfFileException:
-        if type(child_process.before) == 'str':
-            output_buffer += child_process.before
-        
-        if type(child_process.after) == 'str':
-            output_buffer += child_process.after
-        
-        last_printed_line = get_last_printed_line(output_buffer)
+# filled in by every test case, so the server startup gives up as soon as the student server exits
+SERVER_PROCESSES = []
 
-        for process in processes_to_terminate:
-            process.terminate(force=True)
-            
-        raise TestException(f'program has unexpectidly terminated at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    
-    return output_buffer
+handle_pexpect = functools.partial(harness.handle_pexpect, empty_output_message=EMPTY_OUTPUT_MESSAGE, peers=SERVER_PROCESSES)
 
 def start_server():
-    server_process = execute_and_detach(f'python3 {STUDENT_FILE_PATH} --address "{ADDRESS}" --port {PORT}')
+    server_process = harness.watch_process(execute_and_detach(f'python3 {STUDENT_FILE_PATH} --address "{ADDRESS}" --port {PORT}'))
     expected_output = "Server is on"
 
     output_buffer = handle_pexpect(server_process, [server_process], expected_output, "", "starting a server", timeout=10)
-        
+    harness.wait_for_tcp(ADDRESS, PORT, timeout=5)
+
     return server_process, output_buffer
 
+async def start_script():
+    session = harness.ChatSession(ADDRESS, PORT)
+    await session.connect("connecting a client to the server")
 
-def execute_and_wait(cmd):
-    process = pexpect.spawn('/bin/sh', ['-c', cmd], encoding='utf-8')
-    process.expect(pexpect.EOF)
-    output = process.before  # Capture the output
-    process.wait()
+    return session
 
-    return process.exitstatus, output
+async def log_in(client_name="client"):
+    session = await start_script()
+    await session.log_in(client_name, "logging in with a client")
 
-def execute_and_collect_output(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    while True:
-        try:
-            line = child.readline()
-            if not line:
-                break
-            yield line
-        except pexpect.EOF:
-            break
+    return session
 
-def execute_and_detach(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    return child
-    
+async def reject_usernames_commas():
+    client_name_pt1 = generate_name()
+    client_name_pt2 = generate_name()
 
-def start_script():
-    expected_output = 'Welcome to Chat Client. Enter your login:'
+    session = await start_script()
+    await session.log_in(f'{client_name_pt1},{client_name_pt2}', "logging in with a username that contains commas", expected='BAD-RQST-BODY')
 
-    current_dir = os.getcwd()
-    os.chdir(CLIENT_FOLDER_PATH)
+    return session
 
-    client_process = pexpect.spawn(f'java -jar ChatClient.jar', encoding='utf-8')
+async def reject_usernames_spaces():
+    client_name_pt1 = generate_name()
+    client_name_pt2 = generate_name()
 
-    os.chdir(current_dir)
+    session = await start_script()
+    await session.log_in(f'{client_name_pt1} {client_name_pt2}', "logging in with a username that contains spaces", expected='BAD-RQST-BODY')
 
-    output_buffer = handle_pexpect(client_process, [client_process], expected_output, "", "starting a client")
+    return session
 
-    return client_process, output_buffer
+async def log_in_many(client_names):
+    sessions = await harness.open_sessions(ADDRESS, PORT, len(client_names), "connecting clients to the server")
 
-def log_in(client_name="client"):
-    expected_output = f'Successfully logged in as {client_name}!'
+    return await harness.log_in_sessions(sessions, client_names, "logging in many clients at the same time")
 
-    client_process, output_buffer = start_script()
-    client_process.sendline(client_name)
+async def test_16_clients():
+    MAX_CLIENTS = 16
+    client_names = [generate_name() for _ in range(MAX_CLIENTS)]
 
-    output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, "logging in with a client", timeout=3)
+    await log_in_many(client_names)
 
-    return client_process, output_buffer
+async def test_busy():
+    MAX_CLIENTS = 16
 
-def reject_usernames_commas():
-    client_name_pt1 = generate_name()
-    client_name_pt2 = generate_name()
-    
-    expected_output = "BAD-RQST-BODY"
+    client_names = [generate_name() for _ in range(MAX_CLIENTS)]
+    await log_in_many(client_names)
 
-    echo_cmd = f'echo "HELLO-FROM {client_name_pt1},{client_name_pt2}"'
-    _, echo_output = execute_and_wait(echo_cmd)
+    busy_session = await start_script()
+    await busy_session.log_in(generate_name(), "logging into busy server", expected='BUSY')
 
-    nc_cmd = f'echo "{echo_output}" | nc 127.0.0.1 5378 -W 1'
+    return busy_session
 
-    _, output = execute_and_wait(nc_cmd)
-    
-    if not expected_output in output:
-        raise TestException(f"your server did not return BAD-RQST-BODY when logging in with a username that contains commas. Reply was '{output}'")
+async def disconnect():
+    client_name = generate_name()
+    client_name_2 = generate_name()
 
-    return output
+    session_1 = await log_in(client_name)
+    session_2 = await log_in(client_name_2)
 
-def reject_usernames_spaces():
-    client_name_pt1 = generate_name()
-    client_name_pt2 = generate_name()
-    
-    expected_output = "BAD-RQST-BODY"
+    # closing the connection is how a client logs out
+    await session_2.close()
 
-    echo_cmd = f'echo "HELLO-FROM {client_name_pt1} {client_name_pt2}"'
-    _, echo_output = execute_and_wait(echo_cmd)
+    # this should give server enough time to handle a disconnection, the case is decided by BAD-DEST-USER alone
+    await asyncio.to_thread(harness.wait_for_user_removed, ADDRESS, PORT, client_name_2, timeout=10)
 
-    nc_cmd = f'echo "{echo_output}" | nc 127.0.0.1 5378 -W 1'
+    await session_1.send_message(client_name_2, generate_message(), "closing the connection of a client and sending a message to the disconnected client", expected='BAD-DEST-USER')
 
-    _, output = execute_and_wait(nc_cmd)
-    
-    if not expected_output in output:
-        raise TestException(f"your server did not return BAD-RQST-BODY when logging in with a username that contains spaces. Reply was '{output}'")
+    return session_1
 
-    return output
+async def log_in_duplicate():
+    client_name = generate_name()
 
-def test_16_clients():
-    MAX_CLIENTS = 16
-    client_nameS = [generate_name() for _ in range(MAX_CLIENTS)]
+    session_1 = await log_in(client_name)
+    session_2 = await start_script()
 
-    [log_in(f'{client_nameS[i]}') for i in range(0, 16)]
+    await session_2.log_in(client_name, f'logging a client in with a duplicate name {client_name}', expected='IN-USE')
 
-def test_busy():
-    MAX_CLIENTS = 16
+    return session_1
 
-    client_names = [generate_name() for _ in range(MAX_CLIENTS)]
-    logged_processes = [log_in(f'{client_names[i]}') for i in range(0, 16)]
+async def list_users():
+    client_names = [generate_name() for _ in range(3)]
+    sessions = [await log_in(client_name) for client_name in client_names]
 
-    client_name = generate_name()
-    expected_output = "Cannot log in. The server is full!"
+    listed = await sessions[2].list_users('listing users with LIST')
 
-    busy_process, output_buffer = start_script()
-    busy_process.sendline(client_name)
+    for client_name in client_names:
+        if client_name not in listed:
+            raise TestException(f'the name {client_name} is missing from the LIST-OK reply. The server listed {", ".join(listed)}')
 
-    output_buffer = handle_pexpect(busy_process, [busy_process], expected_output, output_buffer, "logging into busy server")
+    return sessions[2]
 
-    [process.terminate() for process, _ in logged_processes]
+async def exchange_messages(msgs, step):
+    client_name_1 = generate_name()
+    client_name_2 = generate_name()
 
-    return busy_process, output_buffer
+    session_1 = await log_in(client_name_1)
+    session_2 = await log_in(client_name_2)
 
-def disconnect():
-    client_name = generate_name()
-    client_name_2 = generate_name()
-    
-    expected_output = "The destination user does not exist."
+    for msg in msgs:
+        await session_1.send_message(client_name_2, msg, step)
 
-    client_process_1, output_buffer_1 = log_in(client_name)
-    client_process_2, _ = log_in(client_name_2)
+    await session_2.expect_deliveries(client_name_1, msgs, step, 20)
 
-    client_process_2.sendline('!quit')
-    client_process_2.terminate()
+    return session_2
 
-    time.sleep(10) # this should give server enough time to handle a disconnection
+async def test_simple_exchange():
+    TOTAL_MSGS_SENT = 10
+    msgs = [generate_message() for _ in range(TOTAL_MSGS_SENT)]
 
-    client_process_1.sendline(f'@{client_name_2} {generate_message()}')
+    return await exchange_messages(msgs, "performing a simple message exchange (exchanging 10 messages from one client to another)")
 
-    output_buffer_1 = handle_pexpect(client_process_1, [client_process_1], expected_output, output_buffer_1, "disconnecting a client and sending a message to disconnected client")
+async def test_longer_exchange_messages():
+    TOTAL_MSGS_SENT = 10
+    msgs = [generate_message(256, 512) for i in range(TOTAL_MSGS_SENT)]
 
-    client_process_1.terminate()
+    return await exchange_messages(msgs, "performing a simple message exchange (exchanging 10 messages between two clients)")
 
-    return client_process_1, output_buffer_1
+async def send_message_to_unknown():
+    client_name_1 = generate_name()
+    client_name_2 = generate_name()
 
-def log_in_duplicate():
-    client_name = generate_name()
-    expected_output = f'Cannot log in as {client_name}. That username is already in use.'
+    session = await log_in(client_name_1)
+    await session.send_message(client_name_2, generate_message(), "sending a message to not-existent user", expected='BAD-DEST-USER')
 
-    client_process_1, output_buffer_1 = log_in(client_name)
+    return session
 
-    client_process_2, output_buffer_2 = start_script()
-    client_process_2.sendline(client_name)
+def verify_file_for_sendall():
+    harness.check_student_file(os.path.join(os.getcwd(), STUDENT_FILE_PATH), forbidden=[harness.SENDALL])
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2], expected_output, output_buffer_2, 
-                   f'logging a client in with a duplicate name {client_name}')
+async def error_body():
+    client_name_1 = generate_name()
+    client_name_2 = "echobot"
 
-    client_process_1.terminate()
-    client_process_2.terminate()
+    session = await log_in(client_name_1)
+    await session.send_message(client_name_2, '', "sending a message with an error in a body to receive BAD-RQST-BODY response", expected='BAD-RQST-BODY')
 
-    return client_process_1, output_buffer_1
+    return session
 
-def list_users():
+async def send_message_before_login():
     client_name_1 = generate_name()
-    client_name_2 = generate_name()
-    client_name_3 = generate_name()
 
-    client_process_1, _ = log_in(client_name_1)
-    client_process_2, _ = log_in(client_name_2)
+    session = await start_script()
+    await session.send_message(client_name_1, generate_message(), "sending a message before logging in", expected='BAD-RQST-HDR')
 
-    client_process_3, output_buffer_3 = log_in(client_name_3)
-    client_process_3.sendline('!who')
+    return session
 
-    output_buffer_3 = handle_pexpect(client_process_3, [client_process_1, client_process_2, client_process_3], client_name_1, output_buffer_3, f'checking the name {client_name_1} is in output of !who command')
-    output_buffer_3 = handle_pexpect(client_process_3, [client_process_1, client_process_2, client_process_3], client_name_2, output_buffer_3, f'checking the name {client_name_2} is in output of !who command')
-    output_buffer_3 = handle_pexpect(client_process_3, [client_process_1, client_process_2, client_process_3], client_name_3, output_buffer_3, f'checking the name {client_name_3} is in output of !who command')
+async def load_server():
+    report, errors = await harness.run_load(ADDRESS, PORT, **LOAD_SETTINGS)
+    harness.add_metrics(**report)
 
-    return client_process_3
+    if errors or report['lost'] or report['disconnected']:
+        examples = '\n'.join(errors[:5])
+        raise TestException(f"the server did not keep up with {report['sessions']} clients sending {report['rate']} messages per second. {report['lost']} of {report['sent']} messages were not delivered, {report['disconnected']} clients were disconnected and {report['errors']} replies were unexpected\n{examples}")
 
-def test_simple_exchange():
-    client_name_1 = generate_name()
-    client_name_2 = generate_name()
-    TOTAL_MSGS_SENT = 10
+async def slow_reader():
+    metrics = await harness.measure_slow_reader(ADDRESS, PORT, SERVER_PROCESSES[0].pid)
+    harness.add_metrics(**metrics)
 
-    client_process_1, output_buffer_1 = log_in(client_name_1)
-    client_process_2, output_buffer_2 = log_in(client_name_2)
+    if metrics['behaviour'] == harness.BLOCKS_GLOBALLY:
+        raise TestException(f"one client that stops reading its socket stalls every other client. While it did, {metrics['stalled_lost']} messages between other clients were not delivered and the delivered ones took {metrics['stalled_p99']}s (p99) instead of {metrics['baseline_p99']}s. Your server should not wait for one client while sending to it")
 
-    msgs = [generate_message() for _ in range(TOTAL_MSGS_SENT)]
-    expected_output = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in msgs])
-    expected_output = r'\s*' + expected_output + r'\s*'
+async def pipelined_lines():
+    metrics, problems = await harness.measure_pipelining(ADDRESS, PORT)
+    harness.add_metrics(**metrics)
 
-    for msg in msgs:
-        client_process_1.sendline(f'@{client_name_2} {msg}')
+    if problems:
+        raise TestException(f"your server lost messages when many SEND lines arrived at once: {problems[0]}. One recv() can return many lines and also only a part of a line")
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2], expected_output, output_buffer_1, "performing a simple message exchange (exchanging 10 messages from one client to another)", 20)
+    if metrics['quadratic']:
+        raise TestException(f"the time your server needs per line grows {metrics['per_line_growth']} times when 16 times more lines arrive at once. This usually means the receive buffer is copied or split again for every line, for example with buffer = buffer[1:] or repeated bytes concatenation")
 
-    return client_process_2, output_buffer_2
+async def connection_churn():
+    metrics, failures = await harness.measure_churn(ADDRESS, PORT, SERVER_PROCESSES[0].pid, **CHURN_SETTINGS)
+    harness.add_metrics(**metrics)
 
-def test_longer_exchange_messages():
-    client_name_1 = generate_name()
-    client_name_2 = generate_name()
-    TOTAL_MSGS_SENT = 10
+    if failures:
+        raise TestException(f"clients that quit and log in again with the same name were not accepted: {failures[0]}. Your server has to free a name as soon as the connection of its user closes")
 
-    client_process_1, output_buffer_1 = log_in(client_name_1)
-    client_process_2, output_buffer_2 = log_in(client_name_2)
+    if metrics['leaked_users']:
+        raise TestException(f"{metrics['leaked_users']} users were still listed after they had quit. Your server has to remove a user when its connection closes")
 
-    msgs = [generate_message(256, 512) for i in range(TOTAL_MSGS_SENT)]
-    expected_output = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in msgs])
-    expected_output = r'\s*' + expected_output + r'\s*'
+    if metrics['leaked_fds'] is not None and metrics['leaked_fds'] > harness.LEAK_SLACK:
+        raise TestException(f"your server had {metrics['leaked_fds']} more open file descriptors after {metrics['sessions']} clients logged in and quit. Your server has to close the socket of a client that quit")
 
-    for msg in msgs:
-        client_process_1.sendline(f'@{client_name_2} {msg}')
+async def soak():
+    metrics, problems = await harness.measure_soak(ADDRESS, PORT, SERVER_PROCESSES[0].pid, **SOAK_SETTINGS)
+    harness.add_metrics(**metrics)
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2], expected_output, output_buffer_1, "performing a simple message exchange (exchanging 10 messages between two clients)", 20)
+    if problems:
+        raise TestException(f"your server did not hold up during {metrics['operations']} logins, messages and disconnects: {'; '.join(problems)}")
 
-    return client_process_2, output_buffer_2
+async def idle_connections():
+    metrics, problems = await harness.measure_idle_scaling(ADDRESS, PORT, SERVER_PROCESSES[0].pid, **IDLE_SETTINGS)
+    harness.add_metrics(**metrics)
 
-def send_message_to_unknown():
-    client_name_1 = generate_name()
-    client_name_2 = generate_name()
+    if problems:
+        raise TestException(f"your server stopped serving its active clients: {problems[0]}")
 
-    message = generate_message()
-    expected_output = "The destination user does not exist"
+async def user_table():
+    metrics, problems = await harness.measure_user_table(ADDRESS, PORT, **USER_TABLE_SETTINGS)
+    harness.add_metrics(**metrics)
 
-    client_process, output_buffer = log_in(client_name_1)
-    client_process.sendline(f'@{client_name_2} {message}')
+    if problems:
+        raise TestException(f"your server failed the user table benchmark: {problems[0]}")
 
-    output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, "sending a message to not-existent user")
-    client_process.terminate()
+async def message_sizes():
+    metrics, problems = await harness.measure_message_sizes(ADDRESS, PORT, **MESSAGE_SIZE_SETTINGS)
+    harness.add_metrics(**metrics)
 
-    return client_process, output_buffer
+    if problems:
+        raise TestException(f"your server did not handle large messages: {problems[0]}")
 
-def verify_file_for_sendall():
-    file_path = os.path.join(os.getcwd(), STUDENT_FILE_PATH)
-
-    try:
-        with open(file_path, 'r') as file:
-            code_str = file.read()
-        
-        if "sendall" in code_str:
-            raise TestException("Found 'sendall' in the code.")
-        else:
-            return True
-    except FileNotFoundError:
-        raise TestException("File server.py was not found. Please ensure that your implementation is saved under server.py name")
-    except Exception as e:
-        raise RuntimeError("An error occurred:", e)
-    
-def error_body():
-    client_name_1 = generate_name()
-    client_name_2 = "echobot"
+    if metrics['quadratic']:
+        raise TestException(f"the time your server needs per byte grew {metrics['per_byte_growth']} times from {harness.LINEAR_FROM} to {metrics['largest_delivered']} byte messages, which points at a receive buffer that is copied for every chunk")
 
-    expected_output = "Error: Unknown issue in previous message body."
+class TestCase(harness.TestCase):
+    def __init__(self, test_func, test_id, test_msg, tags=[], max_clients=300, requires=[]) -> None:
+        super().__init__(test_func, test_id, test_msg, tags, requires)
+        self.max_clients = max_clients
 
-    client_process_1, output_buffer = log_in(client_name_1)
-    client_process_1.sendline(f'@{client_name_2} ')
+    def start_environment(self):
+        SERVER_PROCESSES.clear()
+        server_process, _ = start_server()
+        SERVER_PROCESSES.append(server_process)
 
-    output_buffer = handle_pexpect(client_process_1, [client_process_1], expected_output, output_buffer, "sending a message with an error in a body to receive BAD-RQST-BODY response")
+        return [server_process]
 
-    client_process_1.terminate()
-    return client_process_1, output_buffer
+    def describe_startup_failure(self, error):
+        return 'the server did not start. Please make sure your server prints \'Server is on\' on startup'
+
+    def describe_failure(self, error, processes):
+        server_process = processes[0]
 
-def send_message_before_login():
-    client_name_1 = generate_name()
-    message = generate_message()
-    
-    expected_output = "BAD-RQST-HDR"
-    
-    echo_cmd = f'echo "SEND {client_name_1} {message}"'
-    _, echo_output = execute_and_wait(echo_cmd)
-
-    nc_cmd = f'echo "{echo_output}" | nc 127.0.0.1 5378 -W 1'
-    _, output = execute_and_wait(nc_cmd)
-    
-    if not expected_output in output:
-        raise TestException(f"your server did not return BAD-RQST-HDR when trying to send messages before logging in. Answer was '{output}'")
-
-    return output
-
-class TestCase():
-    def __init__(self, test_func, test_id, test_msg, tags=[], max_clients=300) -> None:
-        self.tags = tags
-        self.test_func = test_func
-        self.test_id = test_id
-        self.test_msg = test_msg
-        self.max_clients = max_clients
-    
-    def execute(self, disable_colors=False):
-        success = True
-        tags_string = ' '.join(self.tags)
-        
         try:
-            server_process, _ = start_server()
+            server_process.expect(pexpect.EOF, timeout=0)
         except:
-            if not disable_colors:
-                print(f'\033[91m[ x ] \033[30m{self.test_id}. {self.test_msg} \033[91mFailed! \033[30m The list of tags is {tags_string} \nError message is the server did not start. Please make sure your server prints \'Server is on\' on startup \033[0m')
-            else:
-                print(f'[ x ] {self.test_id}. {self.test_msg} Failed! The list of tags is {tags_string} \nError message is the server did not start. Please make sure your server prints \'Server is on\' on startup')
-            
-            return False
+            pass
 
-        try:
-            self.test_func()
-            
-            if not disable_colors:
-                print(f'\033[92m[ \u2713 ] \033[30m{self.test_id}. {self.test_msg}. \033[92mSuccess! \033[0m')
-            else:
-                print(f'[ \u2713 ] {self.test_id}. {self.test_msg}. Success!')
-        
-        except Exception as e:
-            try:
-                server_process.expect(pexpect.EOF, timeout=0)
-            except:
-                pass
-
-            if not disable_colors:
-                print(f'\033[91m[ x ] \033[30m{self.test_id}. {self.test_msg} \033[91mFailed! \033[30m The list of tags is {tags_string} \nError message is {e} \nThe server output is {server_process.before} \033[0m')
-            else:
-                print(f'[ x ] {self.test_id}. {self.test_msg} Failed! The list of tags is {tags_string} \nError message is {e} \nThe server output is {server_process.before}')
-            
-            success = False
-        
-        if server_process:
-            server_process.terminate(force=True)
-
-        return success
+        return f'{error} \nThe server output is {harness.OutputCapture(server_process.before)}'
 
 test_cases = [
     TestCase(start_script, "chat_server_001", "Server starts successfully", ['TR5']),
-    TestCase(log_in, "chat_server_002", "Log in with unique name and expect success", ['PR2', 'PR3']),
-    TestCase(log_in_duplicate, "chat_server_003", "Log in with duplicate name and expect failure", ['PR5']),
-    TestCase(list_users, "chat_server_004", "Log in, list users and expect success", ['PR8', 'PR9']),
-    TestCase(test_simple_exchange, "chat_server_005", "Send message to other user and expect success", ['PR10', 'PR11', 'PR12']),
-    TestCase(test_longer_exchange_messages, "chat_server_006", "Send long message to other user and expect success", ['PR10', 'PR11', 'PR12']),
-    TestCase(send_message_to_unknown, "chat_server_007", "Send message to non-existent user and expect failure", ['PR13', 'PR14']),
-    TestCase(verify_file_for_sendall, "chat_server_008", "The server must not use the sendall() function in Python", []),
-    TestCase(error_body,  "chat_server_009", "Last message received from the client contains an error in the body", ['PR4']),
-    TestCase(reject_usernames_spaces, "chat_server_010", "Server does not accept usernames with spaces", ['PR6', 'PR16']),
-    TestCase(reject_usernames_commas, "chat_server_011", "Server does not accept usernames with commas", ['PR6']),
-    TestCase(test_16_clients, "chat_server_012", "Server supports 16 clients", ['TR1', 'TR2']),
-    TestCase(test_busy, "chat_server_013", "Server responds with busy for 17 clients", ['PR15']),
-    TestCase(disconnect, "chat_server_014", "Server accepts disconnections", ['TR3']),
-    TestCase(send_message_before_login, "chat_server_015", "Server responds with a bad header if the message sent by the client who is not logged in", ['PR7'])
+    TestCase(log_in, "chat_server_002", "Log in with unique name and expect success", ['PR2', 'PR3'], requires=['chat_server_001']),
+    TestCase(log_in_duplicate, "chat_server_003", "Log in with duplicate name and expect failure", ['PR5'], requires=['chat_server_002']),
+    TestCase(list_users, "chat_server_004", "Log in, list users and expect success", ['PR8', 'PR9'], requires=['chat_server_002']),
+    TestCase(test_simple_exchange, "chat_server_005", "Send message to other user and expect success", ['PR10', 'PR11', 'PR12'], requires=['chat_server_002']),
+    TestCase(test_longer_exchange_messages, "chat_server_006", "Send long message to other user and expect success", ['PR10', 'PR11', 'PR12'], requires=['chat_server_002']),
+    TestCase(send_message_to_unknown, "chat_server_007", "Send message to non-existent user and expect failure", ['PR13', 'PR14'], requires=['chat_server_002']),
+    harness.StaticTestCase(verify_file_for_sendall, "chat_server_008", "The server must not use the sendall() function in Python", []),
+    TestCase(error_body,  "chat_server_009", "Last message received from the client contains an error in the body", ['PR4'], requires=['chat_server_002']),
+    TestCase(reject_usernames_spaces, "chat_server_010", "Server does not accept usernames with spaces", ['PR6', 'PR16'], requires=['chat_server_001']),
+    TestCase(reject_usernames_commas, "chat_server_011", "Server does not accept usernames with commas", ['PR6'], requires=['chat_server_001']),
+    TestCase(test_16_clients, "chat_server_012", "Server supports 16 clients", ['TR1', 'TR2'], requires=['chat_server_002']),
+    TestCase(test_busy, "chat_server_013", "Server responds with busy for 17 clients", ['PR15'], requires=['chat_server_002']),
+    TestCase(disconnect, "chat_server_014", "Server accepts disconnections", ['TR3'], requires=['chat_server_002']),
+    TestCase(send_message_before_login, "chat_server_015", "Server responds with a bad header if the message sent by the client who is not logged in", ['PR7'], requires=['chat_server_001'])
 ]
 
-parser = argparse.ArgumentParser(description='Process test arguments')
-
-parser.add_argument('--case', type=str, help='Test case name', default=None)
-parser.add_argument('--tags', type=str, help='List of tags', default=None)
-parser.add_argument('--clientfolder', type=str, help='Client path', default=None)
-parser.add_argument('--disablecolors', type=str, help='(optional) disable colors for the codegrade', default=False)
-args = parser.parse_args()
-
-case = args.case
-disable_colors = args.disablecolors
-client_folder = args.clientfolder
-
-if client_folder:
-    CLIENT_FOLDER_PATH = client_folder
-
-if args.tags:
-    try:
-        # Assuming the tags are passed in a format that's convertible to a Python list
-        tags_list = json.loads(args.tags.replace("'", "\""))
-    except json.JSONDecodeError as e:
-        print(f"Error parsing tags: {e}")
-        tags_list = None
-else:
-    tags_list = None
-
-def execute_tests(test_cases, case, tags_list, disable_colors):
-    success = True
-    for test in test_cases:
-        if tags_list is not None and len([tag for tag in test.tags if tag in tags_list]) > 0 and case is None:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-        elif case is not None and case == test.test_id:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-            break
-        elif case is None and tags_list is None:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-        else:
-            continue
-    
-    return success
-
-
-if not execute_tests(test_cases=test_cases, case=case, tags_list=tags_list, disable_colors=disable_colors):
-    exit(1)
-else:
-    exit(0)
+benchmark_cases = [
+    TestCase(load_server, "chat_server_bench_001", "Server delivers messages under load", ['load']),
+    TestCase(slow_reader, "chat_server_bench_002", "A client that stops reading does not stall the other clients", ['load']),
+    TestCase(pipelined_lines, "chat_server_bench_003", "Server parses pipelined and fragmented lines in linear time", ['load']),
+    TestCase(connection_churn, "chat_server_bench_004", "Server keeps up with clients that log in and quit all the time", ['load']),
+    TestCase(soak, "chat_server_bench_005", "Server does not leak memory, file descriptors or threads over a long run", ['load', 'soak']),
+    TestCase(idle_connections, "chat_server_bench_006", "Server stays responsive with thousands of idle connections", ['load']),
+    TestCase(user_table, "chat_server_bench_007", "LIST and logging in stay fast while the user table grows", ['load']),
+    TestCase(message_sizes, "chat_server_bench_008", "Server delivers messages from 1 KB to several MB in linear time", ['load']),
+]
 
+def main():
+    parser = harness.build_argument_parser()
+    # the tests speak the chat protocol themselves now, the option is only accepted for older scripts
+    parser.add_argument('--clientfolder', type=str, help='(deprecated) ignored, the tests no longer start ChatClient.jar', default=None)
+    parser.add_argument('--benchmarks', action='store_true', help='Run the load and performance benchmarks instead of the tests')
+    parser.add_argument('--loadsessions', type=int, help='Number of clients of the load benchmark', default=LOAD_SETTINGS['session_count'])
+    parser.add_argument('--loadrate', type=float, help='Messages per second sent by all load clients together', default=LOAD_SETTINGS['rate'])
+    parser.add_argument('--loadduration', type=float, help='Seconds the load benchmark sends messages for', default=LOAD_SETTINGS['duration'])
+    parser.add_argument('--loadpattern', choices=harness.PATTERNS, help='Who sends messages to whom in the load benchmark', default=LOAD_SETTINGS['pattern'])
+    parser.add_argument('--loadsize', type=int, help='Length of the load messages in characters', default=LOAD_SETTINGS['message_size'])
+    parser.add_argument('--churnclients', type=int, help='Number of clients that log in and quit at the same time in the churn benchmark', default=CHURN_SETTINGS['clients'])
+    parser.add_argument('--churncycles', type=int, help='How often every churn client logs in and quits', default=CHURN_SETTINGS['cycles'])
+    parser.add_argument('--soakduration', type=float, help='Seconds the soak benchmark runs for', default=SOAK_SETTINGS['duration'])
+    parser.add_argument('--soakoperations', type=int, help='Logins, messages and disconnects of the soak benchmark', default=SOAK_SETTINGS['operations'])
+    parser.add_argument('--idleconnections', type=int, help='Largest number of idle connections opened by the idle connection benchmark', default=IDLE_SETTINGS['idle_connections'])
+    parser.add_argument('--usertable', type=int, help='Largest number of logged in users in the user table benchmark', default=USER_TABLE_SETTINGS['size'])
+    parser.add_argument('--largestmessage', type=int, help='Size in bytes of the largest message in the message size benchmark', default=MESSAGE_SIZE_SETTINGS['largest'])
+    args = parser.parse_args()
+
+    harness.set_timeout_scale(args.timeoutscale)
+    harness.enable_network_isolation(args.isolate)
+
+    LOAD_SETTINGS.update(session_count=args.loadsessions, rate=args.loadrate, duration=args.loadduration, pattern=args.loadpattern, message_size=args.loadsize)
+    CHURN_SETTINGS.update(clients=args.churnclients, cycles=args.churncycles)
+    SOAK_SETTINGS.update(duration=args.soakduration, operations=args.soakoperations)
+    IDLE_SETTINGS.update(idle_connections=args.idleconnections)
+    USER_TABLE_SETTINGS.update(size=args.usertable)
+    MESSAGE_SIZE_SETTINGS.update(largest=args.largestmessage)
+
+    if args.benchmarks:
+        harness.raise_file_limit()
+
+    result_cache = harness.ResultCache(STUDENT_FILE_PATH, __file__) if args.incremental and not args.benchmarks else None
+
+    if not harness.execute_tests(benchmark_cases if args.benchmarks else test_cases, args.case, harness.parse_tags(args.tags), args.disablecolors, args.workers, args.timingreport, args.resources, result_cache):
+        exit(1)
+    else:
+        exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -1,106 +1,33 @@
 import pexpect
 import os
-import argparse
-import json
+import sys
 import random
-import signal
 import string
+import time
 from pexpect.exceptions import TIMEOUT as TimeoutException, EOF as EndOfFileException
 
-class TestException(Exception):
-    pass
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import harness
+from harness import TestException, execute_and_detach, expect_messages_in_order, generate_message, generate_name, handle_pexpect, kill_process_group
 
 SERVER_DIRECTORY = "./"
 SERVER_ADDRESS = "127.0.0.1"
 SERVER_PORT = 5382
 STUDENT_FILE_PATH = "../student/unreliable_chat_check/client.py"
 
-def generate_name():
-    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(8, 16)))
-
-def generate_message(min_len=32, max_len=64):
-    return ''.join(random.choice(string.ascii_letters) for _ in range(random.randint(min_len, max_len)))
-
-def get_last_printed_line(output_buffer):
-    last_printed_line = '[EMPTY LINE. PROGRAM DID NOT PRODUCE ANY OUTPUT]'
-    lines = output_buffer.split('\n')
-
-    for line in reversed(lines):
-        if line.strip():
-            last_printed_line = line
-            break
-
-    return last_printed_line
-
-def handle_pexpect(child_process, processes_to_terminate, expect_string, output_buffer, step, timeout=1, display_expect_string=''):
-    try:
-        child_process.expect(expect_string, timeout=timeout)
-        output_buffer += child_process.before + child_process.after
-
-    except TimeoutException:
-        output_buffer += child_process.before
-        last_printed_line = get_last_printed_line(output_buffer)
-
-        for process in processes_to_terminate:
-            process.terminate(force=True)
-
-        if display_expect_string:
-            expect_string = display_expect_string
-
-        raise TestException(f'unexpected output at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    except EndOfFileException:
-        if type(child_process.before) == 'str':
-            output_buffer += child_process.before
-        
-        if type(child_process.after) == 'str':
-            output_buffer += child_process.after
-        
-        last_printed_line = get_last_printed_line(output_buffer)
-
-        for process in processes_to_terminate:
-            process.terminate(force=True)
-            
-        raise TestException(f'program has unexpectidly terminated at step {step}!\nExpected output to appear within a program:\n\n{expect_string}\n\nProgram\'s last printed line: \n\n{last_printed_line}\n\nTotal program output:\n\n{output_buffer}')
-    
-    return output_buffer
+LOGIN_FAILURE_PATTERNS = harness.DEFAULT_FAILURE_PATTERNS + ['Cannot log in']
 
 def start_server(maxClients=300, burst=0, delay=0, flip=0, drop=0, delayLenLower=0, delayLenUpper=0, burstLenLower=0, burstLenUpper=0):
-    current_dir = os.getcwd()
-    os.chdir(SERVER_DIRECTORY)
-
-    server_process = execute_and_detach(f'go run BrokenChatServerLocal.go -address="{SERVER_ADDRESS}" -port="{SERVER_PORT}" -maxClients={maxClients} -burst={burst} -flip={flip} -delay={delay} -drop={drop} -delayLenLower={delayLenLower} -delayLenUpper={delayLenUpper} -burstLenLower={burstLenLower} -burstLenUpper={burstLenUpper}')
+    server_binary = harness.build_go_binary(os.path.join(SERVER_DIRECTORY, 'BrokenChatServerLocal.go'))
+    server_process = execute_and_detach(f'{server_binary} -address="{SERVER_ADDRESS}" -port="{SERVER_PORT}" -maxClients={maxClients} -burst={burst} -flip={flip} -delay={delay} -drop={drop} -delayLenLower={delayLenLower} -delayLenUpper={delayLenUpper} -burstLenLower={burstLenLower} -burstLenUpper={burstLenUpper}', cwd=SERVER_DIRECTORY)
     server_process.expect("The server is running on")
 
-    os.chdir(current_dir)
-
     return server_process
 
-
-def execute_and_wait(cmd):
-    process = pexpect.spawn('/bin/sh', ['-c', cmd], encoding='utf-8')
-    process.expect(pexpect.EOF)
-    process.wait()
-
-    return process.exitstatus
-
-def execute_and_collect_output(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    while True:
-        try:
-            line = child.readline()
-            if not line:
-                break
-            yield line
-        except pexpect.EOF:
-            break
-
-def execute_and_detach(cmd):
-    child = pexpect.spawn(cmd, encoding='utf-8')
-    return child
-
 def start_script():
     expected_output = f'Welcome to Chat Client. Enter your login:'
-    client_process = pexpect.spawn(f'python3 {STUDENT_FILE_PATH} --address "{SERVER_ADDRESS}" --port {SERVER_PORT}', encoding='utf-8')
+    client_process = harness.watch_process(pexpect.spawn(f'python3 {STUDENT_FILE_PATH} --address "{SERVER_ADDRESS}" --port {SERVER_PORT}', encoding='utf-8'))
 
     output_buffer = handle_pexpect(client_process, [client_process], f'{expected_output}', "", "starting the client script")
 
@@ -113,7 +40,7 @@ def log_in(client_name=generate_name()):
     client_process.sendline(client_name)
 
     output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, 
-                   f'logging the client in with the name {client_name}', timeout=10)
+                   f'logging the client in with the name {client_name}', timeout=10, failure_patterns=LOGIN_FAILURE_PATTERNS)
     
 
     return client_process, output_buffer
@@ -165,14 +92,12 @@ def test_simple_exchange():
     client_process_2, output_buffer_2 = log_in(client_name_2)
 
     msgs = [generate_message(16, 32) for _ in range(TOTAL_MSGS_SENT)]
-    expected_output = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in msgs])
-    expected_output_TO_SHOW = ''.join([f'From {client_name_1}: {msg} \n' for msg in msgs])
-    expected_output = r'\s*' + expected_output + r'\s*'
 
+    started = time.monotonic()
     for msg in msgs:
         client_process_1.sendline(f'@{client_name_2} {msg}')
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2], expected_output, output_buffer_1, "performing a simple message exchange (exchanging 5 messages from one client to another)", 20, display_expect_string=expected_output_TO_SHOW)
+    output_buffer_2 = expect_messages_in_order(client_process_2, [client_process_1, client_process_2], client_name_1, msgs, output_buffer_1, "performing a simple message exchange (exchanging 5 messages from one client to another)", 20, peers=[client_process_1], started=started)
 
     return client_process_2, output_buffer_2
 
@@ -186,14 +111,12 @@ def test_simple_exchange_increased_timeout():
     client_process_2, output_buffer_2 = log_in(client_name_2)
 
     msgs = [generate_message(16, 32) for _ in range(TOTAL_MSGS_SENT)]
-    expected_output = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in msgs])
-    expected_output_TO_SHOW = ''.join([f'From {client_name_1}: {msg} \n' for msg in msgs])
-    expected_output = r'\s*' + expected_output + r'\s*'
 
+    started = time.monotonic()
     for msg in msgs:
         client_process_1.sendline(f'@{client_name_2} {msg}')
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2], expected_output, output_buffer_1, "performing a simple message exchange (exchanging 5 messages from one client to another)", 90, display_expect_string=expected_output_TO_SHOW)
+    output_buffer_2 = expect_messages_in_order(client_process_2, [client_process_1, client_process_2], client_name_1, msgs, output_buffer_1, "performing a simple message exchange (exchanging 5 messages from one client to another)", 90, peers=[client_process_1], started=started)
 
     return client_process_2, output_buffer_2
 
@@ -209,25 +132,18 @@ def test_exchange_with_multiple():
     client_process_3, output_buffer_3 = log_in(client_name_3)
 
     msgs_to_client_2 = [''.join(random.choice(string.ascii_letters) for _ in range(random.randint(16, 32))) for i in range(TOTAL_MSGS_SENT)]
-    expected_output_client_2 = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in msgs_to_client_2])
-    expected_output_to_show_2 = ''.join([f'From {client_name_1}: {msg}\n' for msg in msgs_to_client_2])
-    expected_output_client_2 = r'\s*' + expected_output_client_2 + r'\s*'
-
     msgs_to_client_3 = [''.join(random.choice(string.ascii_letters) for _ in range(random.randint(16, 32))) for i in range(TOTAL_MSGS_SENT)]
-    expected_output_client_3 = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in msgs_to_client_3])
-    expected_output_to_show_3 = ''.join([f'From {client_name_1}: {msg}\n' for msg in msgs_to_client_3])
-    expected_output_client_3 = r'\s*' + expected_output_client_3 + r'\s*'
 
+    started = time.monotonic()
     for index_msg in range(TOTAL_MSGS_SENT):
         client_process_1.sendline(f'@{client_name_2} {msgs_to_client_2[index_msg]}')
         client_process_1.sendline(f'@{client_name_3} {msgs_to_client_3[index_msg]}')
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2, client_process_3], expected_output_client_2, output_buffer_2, "performing a simple message exchange between three clients and reading output of the second client", 90, display_expect_string=expected_output_to_show_2)
-    output_buffer_3 = handle_pexpect(client_process_3, [client_process_1, client_process_2, client_process_3], expected_output_client_3, output_buffer_3, "performing a simple message exchange between mutliple clients and reading output of the third client", 90, display_expect_string=expected_output_to_show_3)
+    output_buffer_2 = expect_messages_in_order(client_process_2, [client_process_1, client_process_2, client_process_3], client_name_1, msgs_to_client_2, output_buffer_2, "performing a simple message exchange between three clients and reading output of the second client", 90, peers=[client_process_1], started=started)
+    output_buffer_3 = expect_messages_in_order(client_process_3, [client_process_1, client_process_2, client_process_3], client_name_1, msgs_to_client_3, output_buffer_3, "performing a simple message exchange between mutliple clients and reading output of the third client", 90, peers=[client_process_1], started=started)
 
     return client_process_1, output_buffer_1
 
-
 def test_longer_exchange_messages():
     client_name_1 = generate_name()
     client_name_2 = generate_name()
@@ -238,13 +154,12 @@ def test_longer_exchange_messages():
     client_process_2, output_buffer_2 = log_in(client_name_2)
 
     MSGS = [generate_message(256, 512) for _ in range(TOTAL_MSGS_SENT)]
-    expected_output = ''.join([rf'\s*From\s+{client_name_1}:\s+{msg}\s*\n' for msg in MSGS])
-    expected_output = r'\s*' + expected_output + r'\s*'
 
+    started = time.monotonic()
     for msg in MSGS:
         client_process_1.sendline(f'@{client_name_2} {msg}')
 
-    output_buffer_2 = handle_pexpect(client_process_2, [client_process_1, client_process_2], expected_output, output_buffer_1, "performing a simple message exchange (exchanging 10 messages from one client to another)", 20)
+    output_buffer_2 = expect_messages_in_order(client_process_2, [client_process_1, client_process_2], client_name_1, MSGS, output_buffer_1, "performing a simple message exchange (exchanging 10 messages from one client to another)", 20, peers=[client_process_1], started=started)
 
     return client_process_2, output_buffer_2
 
@@ -305,21 +220,8 @@ def check_name():
     return client_process, output_buffer
 
 def verify_file_for_sendall():
-    file_path = os.path.join(os.getcwd(), STUDENT_FILE_PATH)
+    harness.check_student_file(os.path.join(os.getcwd(), STUDENT_FILE_PATH), forbidden=[harness.SENDALL])
 
-    try:
-        with open(file_path, 'r') as file:
-            code_str = file.read()
-        
-        if "sendall" in code_str:
-            raise AssertionError("Found 'sendall' in the code.")
-        else:
-            return True
-    except FileNotFoundError:
-        raise TestException("file client.py. Please ensure that your implementation is located in the same folder under client.py name")
-    except Exception as e:
-        raise RuntimeError("An error occurred:", e)
-    
 def error_body():
     client_name_1 = generate_name()
     client_name_2 = generate_name()
@@ -337,7 +239,7 @@ def error_body():
         raise TestException(f'unexpected reciever client output when attempting to send erroneous message with the empty body! Expected output: \'{expected_output}\'. Actual output: {client_process_1.readline()}')
     except EndOfFileException:
         client_process_1.terminate(force=True)
-        raise TestException(f'program has unexpectidly terminated when attempting to send erroneous message with the empty body! Expected output: \'{expected_output}\'. Program\'s last output: {client_process_1.before}')
+        raise TestException(f'program has unexpectidly terminated when attempting to send erroneous message with the empty body! Expected output: \'{expected_output}\'. Program\'s last output: {harness.OutputCapture(client_process_1.before)}')
 
     client_process_1.terminate()
 
@@ -378,10 +280,11 @@ def set_and_get():
     client_process, output_buffer  = log_in(client_name)
 
     expected_output = "The value of DELAY-LEN is 0 3"
+    started = time.monotonic()
     client_process.sendline('!set DELAY-LEN 0 3')
     client_process.sendline('!get DELAY-LEN')
 
-    output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, "setting and getting DELAY-LEN")
+    output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, "setting and getting DELAY-LEN", started=started)
 
     return client_process, output_buffer
 
@@ -391,19 +294,20 @@ def reset():
     client_process, output_buffer  = log_in(client_name)
 
     expected_output = "The value of DELAY-LEN is 0 0"
+    started = time.monotonic()
     client_process.sendline('!reset')
     client_process.sendline('!get DELAY-LEN')
 
-    output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, "Resetting all values and getting DELAY-LEN")
+    output_buffer = handle_pexpect(client_process, [client_process], expected_output, output_buffer, "Resetting all values and getting DELAY-LEN", started=started)
 
     return client_process, output_buffer
     
-class TestCase():
-    def __init__(self, test_func, test_id, test_msg, tags=[], max_clients=300, burst=0, delay=0, flip=0, drop=0, delayLenLower=0, delayLenUpper=0, burstLenLower=0, burstLenUpper=0) -> None:
-        self.tags = tags
-        self.test_func = test_func
-        self.test_id = test_id
-        self.test_msg = test_msg
+class TestCase(harness.TestCase):
+    # the reference server and the student client both accept the port as an argument
+    exclusive = False
+
+    def __init__(self, test_func, test_id, test_msg, tags=[], max_clients=300, burst=0, delay=0, flip=0, drop=0, delayLenLower=0, delayLenUpper=0, burstLenLower=0, burstLenUpper=0, requires=[]) -> None:
+        super().__init__(test_func, test_id, test_msg, tags, requires)
 
         self.max_clients = max_clients
         self.burst = burst
@@ -414,10 +318,10 @@ class TestCase():
         self.delayLenUpper = delayLenUpper
         self.burstLenLower = burstLenLower
         self.burstLenUpper = burstLenUpper
-    
-    def execute(self, disable_colors=False):
-        success = True
-        tags_string = ' '.join(self.tags)
+
+    def start_environment(self):
+        global SERVER_PORT
+        SERVER_PORT = harness.find_free_port(SERVER_ADDRESS, udp=True)
 
         server_process = start_server(
             maxClients=self.max_clients,
@@ -430,87 +334,46 @@ class TestCase():
             burstLenLower=self.burstLenLower,
             burstLenUpper=self.burstLenUpper
         )
-        
-        try:
-            self.test_func()
-            if not disable_colors:
-                print(f'\033[92m[ \u2713 ] \033[30m{self.test_id}. {self.test_msg}. \033[92mSuccess! \033[0m')
-            else:
-                print(f'[ \u2713 ] {self.test_id}. {self.test_msg}. Success!')
-        
-        except Exception as e:
-            if not disable_colors:
-                print(f'\033[91m[ x ] \033[30m{self.test_id}. {self.test_msg} \033[91mFailed! \033[30m The list of tags is {tags_string} \nError message is {e} \033[0m')
-            else:
-                print(f'[ x ] {self.test_id}. {self.test_msg} Failed! The list of tags is {tags_string} \nError message is {e}')
-            
-            success = False
-        
-        server_process.kill(signal.SIGKILL)
-
-        return success
 
+        return [server_process]
+
+    def stop_environment(self, processes):
+        for process in processes:
+            kill_process_group(process)
 
 test_cases = [
     TestCase(start_script, "chat_unreliable_001", "Start client and expect welcome message", ['RA1', 'RI2', 'RT7']),
-    TestCase(log_in, "chat_unreliable_002", "Log in with unique name and expect success message", ['RT1', 'RI1', 'RT7', 'RI3']),
-    TestCase(check_name, "chat_unreliable_003", "The client must inform a user if their username was rejected for any other reason and ask for a new username - forbidden symbols (!@#$%^&*)", ['RT1', 'RI1', 'RT7', 'RA4', 'RT1']),
-    TestCase(log_in_duplicate, "chat_unreliable_004", "Log in with duplicate name and expect in use messsage", ['RT1', 'RI1', 'RT7', 'RA2', 'RI4']),
-    TestCase(not_restart_failed_attempt, "chat_unreliable_005", "Expect a client to not restart after a failed log in attempt", ['RT1', 'RI1', 'RT7', 'RA6']),
-    TestCase(test_busy, "chat_unreliable_006", "Log in with busy server, expect failure, and shut client down gracefully", ['RT1', 'RI1', 'RT7', 'RI6'], max_clients=0),
-    TestCase(test_simple_exchange, "chat_unreliable_007", "Send message to other user and expect success (no unreliabillity settings)", ['RT1', 'RI1', 'RT7', 'RI2', 'RI8', 'RI10']),
-    TestCase(send_message_to_unknown, "chat_unreliable_008", "Send message to non-existent user and expect failure", ['RT1', 'RI1', 'RT7', 'RI9']),
-    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_009", "Send message to other user and expect success (with bursts from 1 up to 16 bits)", ['RT1', 'RI1', 'RT7', 'RI2', 'RI8', 'RI10', 'RE1', 'RE2', 'RE3'], burst=0.05, burstLenLower=1, burstLenUpper=16),
-    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_010", "Sending multiple messages and expecting them to be printed in order (with delay from 0 to 3 seconds)", ['RT1', 'RI1', 'RT7', 'RA2', 'RD1'], delay=1, delayLenLower=0, delayLenUpper=1),
-    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_011", "Send message to other user and expect success (with the bitflip 0.0005)", ['RT1', 'RI1', 'RT7', 'RA2', 'RE1', 'RE2', 'RE3'], flip=0.0005),
-    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_012", "Send message to other user and expect success (with the drop 0.1)", ['RT1', 'RI1', 'RT7', 'RD1', 'RD3', 'RD5'], drop=0.1),
-    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_013", "Send message to other user and expect success (with the drop 0.1, delay from 0 to 1 seconds, and bursts from 1 up to 16 bits)", ['RT1', 'RI1', 'RT7', 'RD1', 'RD3', 'RD5', 'RE1', 'RE2', 'RE3'], drop=0.1, burst=0.05, burstLenLower=1, burstLenUpper=16, delay=1, delayLenLower=0, delayLenUpper=1),
-    TestCase(test_exchange_with_multiple, "chat_unreliable_014", "Sending multiple messages to multiple clients and checking the message ordering (with delay from 0 to 3 seconds)", ['RT1', 'RI1', 'RT7', 'RA2', 'RD1', 'RD2', 'RD3', 'RD4'], delay=1, delayLenLower=0, delayLenUpper=3),
-    TestCase(test_exchange_with_multiple, "chat_unreliable_015", "Sending multiple messages to multiple clients and checking the message ordering (with the drop 0.1, delay from 0 to 1 seconds, and bursts from 1 up to 16 bits)", ['RT1', 'RI1', 'RT7', 'RD1', 'RD3', 'RD5', 'RE1', 'RE2', 'RE3'], drop=0.1, burst=0.05, burstLenLower=1, burstLenUpper=16, delay=1, delayLenLower=0, delayLenUpper=1),
-    TestCase(set_and_get,"chat_unreliable_016","Set DELAY_LEN and expect correct values",['RI11','RI12','RI13','RC2','RC3']),
-    TestCase(reset,"chat_unreliable_017","Reset and expect correct values",['RI14','RI12','RI13','RC4','RC3'],delayLenLower=2,delayLenUpper=2),
+    TestCase(log_in, "chat_unreliable_002", "Log in with unique name and expect success message", ['RT1', 'RI1', 'RT7', 'RI3'], requires=['chat_unreliable_001']),
+    TestCase(check_name, "chat_unreliable_003", "The client must inform a user if their username was rejected for any other reason and ask for a new username - forbidden symbols (!@#$%^&*)", ['RT1', 'RI1', 'RT7', 'RA4', 'RT1'], requires=['chat_unreliable_001']),
+    TestCase(log_in_duplicate, "chat_unreliable_004", "Log in with duplicate name and expect in use messsage", ['RT1', 'RI1', 'RT7', 'RA2', 'RI4'], requires=['chat_unreliable_002']),
+    TestCase(not_restart_failed_attempt, "chat_unreliable_005", "Expect a client to not restart after a failed log in attempt", ['RT1', 'RI1', 'RT7', 'RA6'], requires=['chat_unreliable_002']),
+    TestCase(test_busy, "chat_unreliable_006", "Log in with busy server, expect failure, and shut client down gracefully", ['RT1', 'RI1', 'RT7', 'RI6'], max_clients=0, requires=['chat_unreliable_001']),
+    TestCase(test_simple_exchange, "chat_unreliable_007", "Send message to other user and expect success (no unreliabillity settings)", ['RT1', 'RI1', 'RT7', 'RI2', 'RI8', 'RI10'], requires=['chat_unreliable_002']),
+    TestCase(send_message_to_unknown, "chat_unreliable_008", "Send message to non-existent user and expect failure", ['RT1', 'RI1', 'RT7', 'RI9'], requires=['chat_unreliable_002']),
+    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_009", "Send message to other user and expect success (with bursts from 1 up to 16 bits)", ['RT1', 'RI1', 'RT7', 'RI2', 'RI8', 'RI10', 'RE1', 'RE2', 'RE3'], burst=0.05, burstLenLower=1, burstLenUpper=16, requires=['chat_unreliable_007']),
+    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_010", "Sending multiple messages and expecting them to be printed in order (with delay from 0 to 3 seconds)", ['RT1', 'RI1', 'RT7', 'RA2', 'RD1'], delay=1, delayLenLower=0, delayLenUpper=1, requires=['chat_unreliable_007']),
+    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_011", "Send message to other user and expect success (with the bitflip 0.0005)", ['RT1', 'RI1', 'RT7', 'RA2', 'RE1', 'RE2', 'RE3'], flip=0.0005, requires=['chat_unreliable_007']),
+    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_012", "Send message to other user and expect success (with the drop 0.1)", ['RT1', 'RI1', 'RT7', 'RD1', 'RD3', 'RD5'], drop=0.1, requires=['chat_unreliable_007']),
+    TestCase(test_simple_exchange_increased_timeout, "chat_unreliable_013", "Send message to other user and expect success (with the drop 0.1, delay from 0 to 1 seconds, and bursts from 1 up to 16 bits)", ['RT1', 'RI1', 'RT7', 'RD1', 'RD3', 'RD5', 'RE1', 'RE2', 'RE3'], drop=0.1, burst=0.05, burstLenLower=1, burstLenUpper=16, delay=1, delayLenLower=0, delayLenUpper=1, requires=['chat_unreliable_007']),
+    TestCase(test_exchange_with_multiple, "chat_unreliable_014", "Sending multiple messages to multiple clients and checking the message ordering (with delay from 0 to 3 seconds)", ['RT1', 'RI1', 'RT7', 'RA2', 'RD1', 'RD2', 'RD3', 'RD4'], delay=1, delayLenLower=0, delayLenUpper=3, requires=['chat_unreliable_007']),
+    TestCase(test_exchange_with_multiple, "chat_unreliable_015", "Sending multiple messages to multiple clients and checking the message ordering (with the drop 0.1, delay from 0 to 1 seconds, and bursts from 1 up to 16 bits)", ['RT1', 'RI1', 'RT7', 'RD1', 'RD3', 'RD5', 'RE1', 'RE2', 'RE3'], drop=0.1, burst=0.05, burstLenLower=1, burstLenUpper=16, delay=1, delayLenLower=0, delayLenUpper=1, requires=['chat_unreliable_007']),
+    TestCase(set_and_get,"chat_unreliable_016","Set DELAY_LEN and expect correct values",['RI11','RI12','RI13','RC2','RC3'], requires=['chat_unreliable_002']),
+    TestCase(reset,"chat_unreliable_017","Reset and expect correct values",['RI14','RI12','RI13','RC4','RC3'],delayLenLower=2,delayLenUpper=2, requires=['chat_unreliable_002']),
 ]
 
+def main():
+    parser = harness.build_argument_parser()
+    args = parser.parse_args()
 
-parser = argparse.ArgumentParser(description='Process test arguments')
-
-parser.add_argument('--case', type=str, help='Test case name', default=None)
-parser.add_argument('--tags', type=str, help='List of tags', default=None)
-parser.add_argument('--disablecolors', type=str, help='(optional) for codegrade to disable colors for readable output', default=None)
-args = parser.parse_args()
+    harness.set_timeout_scale(args.timeoutscale)
+    harness.enable_network_isolation(args.isolate)
 
-case = args.case
-disable_colors = args.disablecolors
+    result_cache = harness.ResultCache(STUDENT_FILE_PATH, __file__) if args.incremental else None
 
-if args.tags:
-    try:
-        # Assuming the tags are passed in a format that's convertible to a Python list
-        tags_list = json.loads(args.tags.replace("'", "\""))
-    except json.JSONDecodeError as e:
-        print(f"Error parsing tags: {e}")
-        tags_list = None
-else:
-    tags_list = None
-
-def execute_tests(test_cases, case, tags_list):
-    success = True
-    for test in test_cases:
-        if tags_list is not None and len([tag for tag in test.tags if tag in tags_list]) > 0 and case is None:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-        elif case is not None and case == test.test_id:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-            break
-        elif case is None and tags_list is None:
-            if not test.execute(disable_colors=disable_colors):
-                success = False
-        else:
-            continue
-    
-    return success
+    if not harness.execute_tests(test_cases, args.case, harness.parse_tags(args.tags), args.disablecolors, args.workers, args.timingreport, args.resources, result_cache):
+        exit(1)
+    else:
+        exit(0)
 
-if not execute_tests(test_cases=test_cases, case=case, tags_list=tags_list):
-    exit(1)
-else:
-    exit(0)
+if __name__ == '__main__':
+    main()